@@ -1,125 +1,209 @@
 # Paste your full app.py code here
 
+import time
+
+import httpx
 import streamlit as st
-from openai import OpenAI
+from openai import APIConnectionError, OpenAI
 from pinecone import Pinecone
-import os
 
 # ==============================
 # 🔑 API Keys
 # ==============================
-OPENAI_API_KEY = st.secrets["OPENAI_API_KEY"]
-PINECONE_API_KEY = st.secrets["PINECONE_API_KEY"]
+# Reading secrets also exports root-level keys as env vars, which settings.py picks up.
+# A thin client (ASSISTANT_API_URL set) needs no API keys, or even a secrets file; the service holds them.
+def _secret(key):
+    try:
+        return st.secrets.get(key, "")
+    except FileNotFoundError:  # no secrets.toml at all
+        return ""
+
+OPENAI_API_KEY = _secret("OPENAI_API_KEY")
+PINECONE_API_KEY = _secret("PINECONE_API_KEY")
 
-client = OpenAI(api_key=OPENAI_API_KEY)
-pc = Pinecone(api_key=PINECONE_API_KEY)
+from butterfly_assistant.answer_cache import SemanticAnswerCache
+from butterfly_assistant.client import RemotePipeline, RemoteQueryLog
+from butterfly_assistant.embedding_cache import EmbeddingCache
+from butterfly_assistant.history import ConversationSummary
+from butterfly_assistant.kits import KIT_NAMES
+from butterfly_assistant.metrics import MetricsExporter, bind_cache_metrics, start_http_server, start_textfile_writer
+from butterfly_assistant.session import SessionContext
+from butterfly_assistant.telemetry import Trace, make_exporters
+from butterfly_assistant.tuning import QueryLog, Tuning, feedback_label
+from butterfly_assistant.pipeline import FastPathStats, RagPipeline, create_compressor, create_lexical_index
+from butterfly_assistant.rerank import make_reranker
+from butterfly_assistant.retrievers import make_retriever
+from butterfly_assistant.settings import (
+    ANSWER_CACHE_MAX_DISTANCE,
+    ANSWER_CACHE_MAX_ENTRIES,
+    ANSWER_CACHE_TTL_SECONDS,
+    ASSISTANT_API_URL,
+    EMBED_CACHE_PATH,
+    EMBED_CACHE_SIZE,
+    LOCAL_INDEX_DIR,
+    METRICS_PORT,
+    METRICS_TEXTFILE_PATH,
+    OTEL_EXPORTER_OTLP_ENDPOINT,
+    PINECONE_INDEX_NAME,
+    PINECONE_NAMESPACE,
+    QUERY_LOG_PATH,
+    RERANK_ENABLED,
+    RERANK_MODEL,
+    RETRIEVER_BACKEND,
+    STREAM_ANSWERS,
+    SUMMARY_BATCH_TURNS,
+    SUMMARY_ENABLED,
+    SUMMARY_KEEP_RECENT_TURNS,
+    TRACE_LOG_PATH,
+    TUNING_PATH,
+)
 
 # ==============================
-# 📦 Pinecone Setup
+# 🔌 Clients
 # ==============================
-PINECONE_INDEX_NAME = "diy-kit-support"
-index = pc.Index(PINECONE_INDEX_NAME)
+# Streamlit re-runs this script on every interaction. Everything below is built once per
+# process and shared by all reruns and sessions, so HTTP connection pools (and their
+# TCP/TLS sessions) are reused instead of being rebuilt on each rerun.
+setup_started = time.perf_counter()
+
+def _client_is_open(client):
+    return not client.is_closed()
 
-# OpenAI embedding model
-OPENAI_EMBED_MODEL = "text-embedding-3-small"
+@st.cache_resource(validate=_client_is_open)
+def get_openai_client():
+    return OpenAI(api_key=OPENAI_API_KEY)
+
+@st.cache_resource
+def get_pinecone():
+    return Pinecone(api_key=PINECONE_API_KEY)
 
 # ==============================
-# 🧑‍🏫 Mentor-style instruction
+# 📦 Retrieval
 # ==============================
-MENTOR_STYLE_INSTRUCTION = (
-    "You are a friendly mentor helping kids and parents with Butterfly Fields DIY kits. "
-    "Always explain things in a clear, step-by-step way, simple enough for a child but also helpful for parents. "
-    "Keep your tone encouraging and supportive, like a teacher guiding a curious student. "
-    "Give answers in short, bite-sized pieces (2–4 sentences max). "
-    "Whenever possible, use simple bullets (•) or numbered steps (1, 2, 3). "
-    "If the instruction manuals provide the answer, use only them to give your answer. "
-    "Otherwise, say you don't know. "
-)
+def _retriever_is_healthy(retriever):
+    return retriever.is_healthy()
 
-# Predefined kit list
-KNOWN_KITS = [
-    "Retail Kits: ",
-    "-------------",
-    "5in1 Robotics Kit",
-    "10in1 Robotics Kit",
-    "40in1 Robotics Kit",
-    "*********************"
-    "School Kits: ",
-    "-------------",
-    "Fun With Magnets",
-    "Components of food",
-    "Integers Positive and Negative",
-    "Separation of substances",
-    "Mensuration – Area perimeter",
-    "Motion and measurement of distance",
-    "India Natural Resources Minerals and Rocks",
-    "Journey of a water drop",
-    "Practical Geometry Constructions",
-    "Numbers Factors Multiples"
-]
-kit_list = "\n".join([f"- {kit}" for kit in KNOWN_KITS])
+@st.cache_resource(validate=_retriever_is_healthy)
+def get_retriever():
+    return make_retriever(
+        RETRIEVER_BACKEND,
+        LOCAL_INDEX_DIR,
+        PINECONE_NAMESPACE,
+        pinecone_index=lambda: get_pinecone().Index(PINECONE_INDEX_NAME),
+    )
 
 # ==============================
-# 🔎 Query Function
+# 🗃️ Caches
 # ==============================
-def answer_query_with_confidence_2(user_query, chat_history, threshold=0.5, max_history_turns=10):
-
-    # --- Step 2: Query Pinecone for relevant context ---
-    embedding = client.embeddings.create(
-        input = user_query,
-        model = "text-embedding-3-small",
-    ).data[0].embedding
-
-    results = index.query(
-        vector=embedding,
-        top_k=5,
-        namespace="diy_kit_support_chunks",
-        include_metadata=True
+@st.cache_resource
+def get_embedding_cache():
+    embedding_cache = EmbeddingCache(maxsize=EMBED_CACHE_SIZE, path=EMBED_CACHE_PATH or None)
+    bind_cache_metrics(embedding_cache)
+    return embedding_cache
+
+@st.cache_resource
+def get_answer_cache():
+    return SemanticAnswerCache(
+        max_distance=ANSWER_CACHE_MAX_DISTANCE,
+        ttl_seconds=ANSWER_CACHE_TTL_SECONDS,
+        max_entries=ANSWER_CACHE_MAX_ENTRIES,
     )
 
-    best_score = results.matches[0].score if results.matches else 0
-    context_texts = [m.metadata.get("text_content", "") for m in results.matches]
-
-    #print(f"Best score: {best_score}")
-
-    # --- Step 3: Build messages ---
-    llm_prompt = []
-
-    # 3.1 : Add system instruction to LLM prompt - ROLE: SYSTEM
-    llm_prompt.append({"role": "system", "content": MENTOR_STYLE_INSTRUCTION})
-
-    # 3.2 : Add fallback response
-    fallback_response = (
-          f"🤔 Sorry, I don’t see that in the Butterfly Fields manuals. 🦋  \n"
-          "Could you tell me which kit or activity you mean?  \n"
-          "\nHere are some kits I can answer about:\n"
-          f"{kit_list}"
-      )
-    
-    # 3.2 : Add chat history to LLM prompt - MEMORY
-    for msg in chat_history:
-        llm_prompt.append(msg)
-
-    # 3.3: Add retrieved docs to LLM prompt - KNOWLEDGE BASE
-    if best_score >= threshold:
-      context_block = "\n\n".join(context_texts)
-      context = f"Relevant context from instruction manuals:\n{context_block}"
-      llm_prompt.append({"role": "user", "content": context})
-    else:
-      context = fallback_response  # empty -> fallback response
-      llm_prompt.append({"role": "assistant", "content": context})
+@st.cache_resource
+def get_lexical_index():
+    return create_lexical_index()
+
+@st.cache_resource
+def get_compressor():
+    return create_compressor()
+
+@st.cache_resource
+def get_reranker():
+    # A cross-encoder loads its model weights here, once per process
+    return make_reranker(RERANK_MODEL) if RERANK_ENABLED else None
+
+@st.cache_resource
+def get_fast_path_stats():
+    return FastPathStats()
+
+@st.cache_resource
+def get_kits_without_chunks():
+    # Kits the index has no chunks for, learned once per process (see RagPipeline._unfiltered)
+    return set()
+
+@st.cache_resource
+def get_tuning():
+    return Tuning.load(TUNING_PATH)
 
-    # 3.4: Add user query to LLM prompt
-    llm_prompt.append({"role": "user", "content": user_query})
+@st.cache_resource
+def get_query_log():
+    if ASSISTANT_API_URL:
+        return RemoteQueryLog(get_remote_pipeline)  # labels go to the service's query log
+    return QueryLog(QUERY_LOG_PATH) if QUERY_LOG_PATH else None
 
-    # --- Step 4: Generate answer ---
-    response = client.chat.completions.create(
-        model="gpt-3.5-turbo",  # 💰 cheaper model for main chat
-        messages=llm_prompt,
-        temperature=0.2
+@st.cache_resource
+def get_trace_exporters():
+    exporters = make_exporters(TRACE_LOG_PATH, OTEL_EXPORTER_OTLP_ENDPOINT)
+    if not ASSISTANT_API_URL:  # a thin client serves no metrics; the API workers record their own
+        exporters.append(MetricsExporter())
+    return exporters
+
+@st.cache_resource
+def start_metrics_exporters():
+    # Once per process: a sidecar /metrics endpoint and/or a textfile for node_exporter
+    if METRICS_PORT:
+        try:
+            start_http_server(METRICS_PORT)
+        except OSError as e:  # e.g. a second Streamlit process on the same host
+            print(f"Metrics endpoint on port {METRICS_PORT} unavailable: {e}")
+    if METRICS_TEXTFILE_PATH:
+        start_textfile_writer(METRICS_TEXTFILE_PATH)
+    return True
+
+# The caches and metrics belong to whichever process runs the pipeline: here, or the API workers
+if not ASSISTANT_API_URL:
+    start_metrics_exporters()
+
+@st.cache_resource(validate=_client_is_open)
+def get_remote_pipeline():
+    return RemotePipeline(ASSISTANT_API_URL)
+
+def get_pipeline():
+    if ASSISTANT_API_URL:
+        return get_remote_pipeline()
+    # Cheap to build; it only holds references to the cached resources above
+    return RagPipeline(
+        get_openai_client(),
+        get_retriever(),
+        get_embedding_cache(),
+        get_answer_cache(),
+        lexical_index=get_lexical_index(),
+        reranker=get_reranker(),
+        compressor=get_compressor(),
+        fast_path_stats=get_fast_path_stats(),
+        tuning=get_tuning(),
+        query_log=get_query_log(),
+        kits_without_chunks=get_kits_without_chunks(),
     )
 
-    return response.choices[0].message.content, best_score, context_texts, fallback_response
+pipeline = get_pipeline()
+setup_ms = (time.perf_counter() - setup_started) * 1000
+
+# ==============================
+# 🔎 Query Function
+# ==============================
+def answer_query_with_confidence_2(user_query, chat_history, threshold=0.5, max_history_turns=10, stream=False,
+                                   summary=None, kit=None, session=None, trace=None):
+    global pipeline
+    args = (user_query, chat_history, threshold, max_history_turns, stream, summary, kit, session, trace)
+    try:
+        return pipeline.answer(*args)
+    except (APIConnectionError, httpx.TransportError):
+        # Closing the client fails its health check, so get_pipeline() reconnects with a fresh one;
+        # rebinding keeps the rest of this rerun (e.g. the summary update) off the closed client
+        (pipeline if ASSISTANT_API_URL else pipeline.client).close()
+        pipeline = get_pipeline()
+        return pipeline.answer(*args)
 
 # ==============================
 # 🌐 Streamlit Chat App
@@ -127,14 +211,27 @@ def answer_query_with_confidence_2(user_query, chat_history, threshold=0.5, max_
 st.title("🦋 Butterfly DIY Assistant")
 st.write("Chat with me about your Butterfly Fields DIY kits. I’ll guide you in building your kits!")
 
+# Kit picker (optional): narrows retrieval to one kit's manuals
+AUTO_DETECT_KIT = "🔍 Detect from my question"
+selected_kit = st.sidebar.selectbox("Which kit are you building?", [AUTO_DETECT_KIT, *KIT_NAMES])
+
 # Reset button
 if st.button("🔄 Reset Chat"):
     st.session_state.messages = []
-    st.experimental_rerun()
+    st.session_state.summary = ConversationSummary()
+    st.session_state.context = SessionContext()
+    st.session_state.last_query = None
+    st.rerun()
 
 # Initialize history
 if "messages" not in st.session_state:
     st.session_state.messages = []
+if "summary" not in st.session_state:
+    st.session_state.summary = ConversationSummary()
+if "context" not in st.session_state:
+    st.session_state.context = SessionContext()
+if "last_query" not in st.session_state:
+    st.session_state.last_query = None  # (query_id, answered) of the newest answer, for 👍/👎
 
 # Display past chat
 for msg in st.session_state.messages:
@@ -145,10 +242,13 @@ for msg in st.session_state.messages:
 best_score = 0.0
 context_texts = []
 fallback_response = ""
+info = {}
+trace = None
 user_input = None  # Also initialize this to avoid NameError in debug panel
 
 # Input at bottom
 if user_input := st.chat_input("Ask me something about your kits..."):
+    trace = Trace("chat-turn")
     # Show user input (on screen, not yet in history)
     with st.chat_message("user"):
         st.markdown(user_input)
@@ -156,25 +256,100 @@ if user_input := st.chat_input("Ask me something about your kits..."):
     # Assistant response
     with st.chat_message("assistant"):
         with st.spinner("Thinking... 🧠"):
-            answer, best_score, context_texts, fallback_response = answer_query_with_confidence_2(
+            answer, best_score, context_texts, fallback_response, info = answer_query_with_confidence_2(
                 user_query=user_input,
-                chat_history=st.session_state.messages  # history excludes this new input
+                chat_history=st.session_state.messages,  # history excludes this new input
+                stream=STREAM_ANSWERS,
+                summary=st.session_state.summary if SUMMARY_ENABLED else None,
+                kit=None if selected_kit == AUTO_DETECT_KIT else selected_kit,
+                session=st.session_state.context,
+                trace=trace,
             )
-            st.markdown(answer)
+        with trace.span("render"):
+            if STREAM_ANSWERS:
+                answer = st.write_stream(answer)  # renders tokens as they arrive, returns the full text
+            else:
+                st.markdown(answer)
+        trace.finish(
+            get_trace_exporters(),
+            kit=info["kit"] or "",
+            retrieval=info["retrieval"],
+            best_score=best_score,
+            fast_path=info["fast_path"],
+        )
 
     # Save both messages to history AFTER response
     st.session_state.messages.append({"role": "user", "content": user_input})
     st.session_state.messages.append({"role": "assistant", "content": answer})
+    if info.get("query_id"):
+        answered = not info["fast_path"] and best_score >= info["threshold"]
+        st.session_state.last_query = (info["query_id"], answered)
+
+    # Fold turns that aged out of the recent window into the running summary, off the critical path
+    keep_recent = 2 * SUMMARY_KEEP_RECENT_TURNS
+    if SUMMARY_ENABLED and st.session_state.summary.due(st.session_state.messages, keep_recent, 2 * SUMMARY_BATCH_TURNS):
+        pipeline.summarise_in_background(st.session_state.summary, st.session_state.messages, keep_recent)
+
+# Feedback on the newest answer labels its logged query for tuning.py
+def _record_feedback(query_id, answered):
+    value = st.session_state[f"feedback_{query_id}"]
+    if value is None:  # the selected thumb was clicked again; keep the earlier label rather than invert it
+        return
+    helpful = value == 1
+    get_query_log().label(query_id, answerable=feedback_label(helpful, answered), helpful=helpful)
+
+if st.session_state.last_query:
+    query_id, answered = st.session_state.last_query
+    st.feedback("thumbs", key=f"feedback_{query_id}", on_change=_record_feedback, args=(query_id, answered))
 
 # Optional: Debug panel
 with st.expander("🛠 Debug Info"):
     st.markdown(f"**User Query:** {user_input}")
-    st.markdown(f"**Best Match Score:** {best_score:.4f}")
+    st.markdown(f"**Resource Setup (this rerun):** {setup_ms:.1f} ms")
+    if trace is not None:
+        stages = " · ".join(f"{name} {ms:.0f} ms" for name, ms in trace.durations().items())
+        st.markdown(f"**Stage Timings:** {stages}")
+    st.markdown(f"**Best Match Score:** {best_score:.4f}" + (f" (threshold {info['threshold']})" if info else ""))
+    if info:
+        st.markdown(f"**Kit Scope:** {info['kit'] or 'all kits'}")
+        st.markdown(f"**Retrieval:** {info['retrieval']}, kept {info['kept']} of {info['candidates']} candidates")
+    if st.session_state.context.last_chunk_ids:
+        st.markdown(f"**Last Retrieved Chunk IDs:** {', '.join(st.session_state.context.last_chunk_ids)}")
+    if info:
+        st.markdown(
+            f"**Prompt Tokens:** {info['prompt_tokens']} "
+            f"({info['history_messages']} history messages kept, {info['history_messages_dropped']} dropped, "
+            f"{info['summarised_messages']} summarised)"
+        )
+        st.markdown(f"**Context Tokens:** {info['context_tokens']} ({info['context_tokens_raw']} before compression)")
+    summary_text, _ = st.session_state.summary.snapshot()
+    if summary_text:
+        st.markdown(f"**Conversation Summary:** {summary_text}")
 
-    if best_score >= 0.5:
+    if best_score >= info.get("threshold", 0.5):
         st.markdown("**Retrieved Context Chunks:**")
         for i, chunk in enumerate(context_texts, 1):
             st.markdown(f"**Chunk {i}:** {chunk}")
     else:
         st.markdown("**Fallback Triggered:** Showing kit list instead of context.")
         st.markdown(f"**Fallback Response:**\n{fallback_response}")
+
+    if ASSISTANT_API_URL:
+        st.markdown(f"**Pipeline:** served by {ASSISTANT_API_URL} (cache stats in its per-worker metrics)")
+    else:
+        cache_stats = get_embedding_cache().stats()
+        st.markdown(
+            f"**Embedding Cache:** {cache_stats['hits']} hits, {cache_stats['disk_hits']} disk hits, "
+            f"{cache_stats['misses']} misses ({cache_stats['hit_rate']:.0%} hit rate, "
+            f"{cache_stats['size']}/{cache_stats['maxsize']} entries)"
+        )
+        answer_stats = get_answer_cache().stats()
+        st.markdown(
+            f"**Answer Cache:** {answer_stats['hits']} hits, {answer_stats['misses']} misses "
+            f"({answer_stats['hit_rate']:.0%} hit rate, {answer_stats['size']}/{answer_stats['max_entries']} entries)"
+        )
+        fast_path = get_fast_path_stats().stats()
+        st.markdown(
+            f"**Fallback Fast Path:** {fast_path['taken']} of {fast_path['queries']} answers "
+            f"({fast_path['rate']:.0%}) served without an LLM call"
+        )
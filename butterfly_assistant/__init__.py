@@ -0,0 +1,9 @@
+"""Butterfly DIY Assistant: retrieval-augmented answers about Butterfly Fields DIY kits.
+
+The Streamlit UI (app.py) runs the pipeline in-process, or talks to the HTTP
+service in api.py through client.py when ``ASSISTANT_API_URL`` is set.
+"""
+
+from .pipeline import RagPipeline, create_pipeline
+
+__all__ = ["RagPipeline", "create_pipeline"]
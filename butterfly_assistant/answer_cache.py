@@ -0,0 +1,123 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from .embedding_cache import normalize_query
+
+
+class SemanticAnswerCache:
+    """Answer cache keyed on query-embedding similarity.
+
+    Answers are grouped by the tuple of retrieved chunk IDs, so a hit needs the
+    same retrieval result *and* a query embedding within ``max_distance``
+    (cosine distance) of a previously answered one. Answers retrieved without an
+    embedding (a confident BM25 hit) are keyed on the normalized query text
+    instead, in a separate LRU of up to ``max_entries``.
+    """
+
+    def __init__(self, max_distance=0.05, ttl_seconds=24 * 3600, max_entries=1000):
+        self.max_distance = max_distance
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._buckets = {}  # chunk_ids -> {"vectors": float32 matrix, "entries": [...]}
+        self._size = 0
+        self._by_text = OrderedDict()  # (normalized query, chunk_ids) -> entry
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, embedding, chunk_ids):
+        key = tuple(chunk_ids)
+        now = time.time()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                self._expire(key, bucket, now)
+                bucket = self._buckets.get(key)
+            if bucket is not None:
+                similarities = bucket["vectors"] @ _unit(embedding)
+                best = int(np.argmax(similarities))
+                if 1.0 - similarities[best] <= self.max_distance:
+                    entry = bucket["entries"][best]
+                    entry["last_used"] = now
+                    self.hits += 1
+                    return entry["answer"]
+            self.misses += 1
+            return None
+
+    def store(self, embedding, chunk_ids, answer):
+        key = tuple(chunk_ids)
+        now = time.time()
+        with self._lock:
+            bucket = self._buckets.setdefault(
+                key, {"vectors": np.empty((0, len(embedding)), dtype=np.float32), "entries": []}
+            )
+            bucket["vectors"] = np.vstack([bucket["vectors"], _unit(embedding)])
+            bucket["entries"].append({"answer": answer, "created": now, "last_used": now})
+            self._size += 1
+            while self._size > self.max_entries:
+                self._evict_least_recently_used()
+
+    def lookup_text(self, query, chunk_ids):
+        key = (normalize_query(query), tuple(chunk_ids))
+        now = time.time()
+        with self._lock:
+            entry = self._by_text.get(key)
+            if entry is not None and now - entry["created"] >= self.ttl_seconds:
+                del self._by_text[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._by_text.move_to_end(key)
+            entry["last_used"] = now
+            self.hits += 1
+            return entry["answer"]
+
+    def store_text(self, query, chunk_ids, answer):
+        key = (normalize_query(query), tuple(chunk_ids))
+        now = time.time()
+        with self._lock:
+            self._by_text[key] = {"answer": answer, "created": now, "last_used": now}
+            self._by_text.move_to_end(key)
+            while len(self._by_text) > self.max_entries:
+                self._by_text.popitem(last=False)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": self._size + len(self._by_text),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _expire(self, key, bucket, now):
+        keep = [i for i, e in enumerate(bucket["entries"]) if now - e["created"] < self.ttl_seconds]
+        if len(keep) != len(bucket["entries"]):
+            self._keep_rows(key, bucket, keep)
+
+    def _evict_least_recently_used(self):
+        key, row = min(
+            ((k, i) for k, b in self._buckets.items() for i in range(len(b["entries"]))),
+            key=lambda kr: self._buckets[kr[0]]["entries"][kr[1]]["last_used"],
+        )
+        bucket = self._buckets[key]
+        self._keep_rows(key, bucket, [i for i in range(len(bucket["entries"])) if i != row])
+
+    def _keep_rows(self, key, bucket, keep):
+        self._size -= len(bucket["entries"]) - len(keep)
+        if not keep:
+            del self._buckets[key]
+            return
+        bucket["vectors"] = bucket["vectors"][keep]
+        bucket["entries"] = [bucket["entries"][i] for i in keep]
+
+
+def _unit(vector):
+    v = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(v)
+    return v / norm if norm else v
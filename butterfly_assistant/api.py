@@ -0,0 +1,222 @@
+"""HTTP API for the answer pipeline, so retrieval and generation scale apart from the Streamlit UI.
+
+    uvicorn butterfly_assistant.api:app --host 0.0.0.0 --port 8000 --workers 4
+
+Each worker process builds its own pipeline (clients, caches, BM25 index,
+reranker) once at start-up from settings.py. Requests are stateless: the
+caller sends the chat history, the conversation summary and the session
+context with every question and gets the updated session context back, so any
+worker behind a load balancer can serve any turn. ``client.py`` is the matching
+client used by app.py when ``ASSISTANT_API_URL`` is set.
+
+Endpoints:
+
+* ``POST /v1/answer`` – the full answer as JSON
+* ``POST /v1/answer/stream`` – server-sent events: one ``meta`` event (score,
+  context, fallback, info, session), ``token`` events as the answer is
+  generated, then ``done`` (or ``error``)
+* ``POST /v1/summary`` – fold older turns into the conversation summary
+* ``POST /v1/feedback`` – label a logged query (👍/👎) for tuning.py
+* ``GET /healthz``
+
+Metrics are per process, so they are not served on the API port (a scrape would
+land on a random worker). With ``METRICS_PORT`` set, each worker serves its own
+``/metrics`` on the first free port from ``METRICS_PORT``: scrape
+``METRICS_PORT`` … ``METRICS_PORT + workers - 1`` as separate targets and
+aggregate in PromQL (e.g. ``sum by (le) (rate(assistant_request_seconds_bucket[5m]))``).
+``METRICS_TEXTFILE_PATH`` only applies to the Streamlit app: node_exporter's
+textfile collector rejects the same series from several files.
+"""
+
+import json
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from openai import OpenAIError
+from pydantic import BaseModel
+
+from .history import ConversationSummary
+from .metrics import MetricsExporter, bind_cache_metrics, start_worker_http_server
+from .pipeline import create_pipeline
+from .session import SessionContext
+from .settings import METRICS_PORT, METRICS_TEXTFILE_PATH, OTEL_EXPORTER_OTLP_ENDPOINT, TRACE_LOG_PATH
+from .telemetry import Trace, make_exporters
+
+
+class Message(BaseModel):
+    role: str
+    content: str
+
+
+class SummaryState(BaseModel):
+    text: str = ""
+    covered: int = 0
+
+
+class SessionState(BaseModel):
+    kit: str | None = None
+    kit_source: str | None = None
+    last_chunk_ids: list[str] = []
+
+
+class AnswerRequest(BaseModel):
+    query: str
+    chat_history: list[Message] = []
+    threshold: float = 0.5
+    max_history_turns: int = 10
+    kit: str | None = None  # the kit picker's selection, if any
+    summary: SummaryState | None = None  # None when summaries are off
+    session: SessionState = SessionState()
+
+
+class SummaryRequest(BaseModel):
+    chat_history: list[Message]
+    keep_recent_messages: int
+    summary: SummaryState = SummaryState()
+
+
+class FeedbackRequest(BaseModel):
+    query_id: str
+    answerable: bool | None = None
+    useful_chunks: list[str] | None = None
+    helpful: bool | None = None
+
+
+# ==============================
+# 🚀 Per-worker resources
+# ==============================
+resources = {}
+
+
+@asynccontextmanager
+async def lifespan(app):
+    pipeline = create_pipeline()
+    bind_cache_metrics(pipeline.embedding_cache)
+    resources["pipeline"] = pipeline
+    resources["exporters"] = [*make_exporters(TRACE_LOG_PATH, OTEL_EXPORTER_OTLP_ENDPOINT), MetricsExporter()]
+    metrics_server = start_worker_http_server(METRICS_PORT) if METRICS_PORT else None
+    if METRICS_TEXTFILE_PATH:
+        print("METRICS_TEXTFILE_PATH is ignored by the API service; set METRICS_PORT to scrape each worker")
+    yield
+    if metrics_server is not None:
+        metrics_server.shutdown()
+    resources.clear()
+
+
+app = FastAPI(title="Butterfly DIY Assistant", lifespan=lifespan)
+
+
+@app.exception_handler(OpenAIError)
+async def openai_error(request: Request, exc: OpenAIError):
+    # The pipeline itself is fine; the upstream model API is not
+    return JSONResponse({"detail": f"Upstream model API error: {exc}"}, status_code=502)
+
+
+# ==============================
+# 💬 Answers
+# ==============================
+def _summary(state):
+    summary = ConversationSummary()
+    summary.restore(state.text, state.covered)
+    return summary
+
+
+async def _answer(request, stream):
+    session = SessionContext()
+    session.restore(request.session.model_dump())
+    trace = Trace("api-answer")
+    result = await resources["pipeline"].answer_async(
+        request.query,
+        [m.model_dump() for m in request.chat_history],
+        request.threshold,
+        request.max_history_turns,
+        stream,
+        _summary(request.summary) if request.summary else None,
+        request.kit,
+        session,
+        trace=trace,
+    )
+    return result, session, trace
+
+
+def _meta(best_score, context_texts, fallback_response, info, session):
+    return {
+        "best_score": float(best_score),
+        "context_texts": context_texts,
+        "fallback_response": fallback_response,
+        "info": info,
+        "session": session.state(),
+    }
+
+
+def _finish(trace, info, best_score):
+    trace.finish(
+        resources["exporters"],
+        kit=info["kit"] or "",
+        retrieval=info["retrieval"],
+        best_score=float(best_score),
+        fast_path=info["fast_path"],
+    )
+
+
+def _event(name, data):
+    return f"event: {name}\ndata: {json.dumps(data, ensure_ascii=False, default=float)}\n\n"
+
+
+@app.post("/v1/answer")
+async def answer(request: AnswerRequest):
+    (text, best_score, context_texts, fallback_response, info), session, trace = await _answer(request, False)
+    _finish(trace, info, best_score)
+    return {"answer": text, **_meta(best_score, context_texts, fallback_response, info, session)}
+
+
+@app.post("/v1/answer/stream")
+async def answer_stream(request: AnswerRequest):
+    # Retrieval errors still surface as a status code; only generation happens inside the stream
+    (tokens, best_score, context_texts, fallback_response, info), session, trace = await _answer(request, True)
+
+    async def events():
+        yield _event("meta", _meta(best_score, context_texts, fallback_response, info, session))
+        try:
+            async for text in tokens:
+                yield _event("token", {"text": text})
+        except OpenAIError as e:  # headers are already sent, so report it in-band
+            yield _event("error", {"detail": f"Upstream model API error: {e}"})
+            return
+        _finish(trace, info, best_score)
+        yield _event("done", {})
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.post("/v1/summary")
+def summarise(request: SummaryRequest):
+    pipeline = resources["pipeline"]
+    summary = _summary(request.summary)
+    summary.update(
+        pipeline.client,
+        pipeline.chat_model,
+        [m.model_dump() for m in request.chat_history],
+        request.keep_recent_messages,
+    )
+    text, covered = summary.snapshot()
+    return {"text": text, "covered": covered}
+
+
+@app.post("/v1/feedback")
+def feedback(request: FeedbackRequest):
+    query_log = resources["pipeline"].query_log
+    if query_log is None:  # QUERY_LOG_PATH not set on the server
+        return {"recorded": False}
+    query_log.label(request.query_id, request.answerable, request.useful_chunks, request.helpful)
+    return {"recorded": True}
+
+
+# ==============================
+# 🩺 Operations
+# ==============================
+@app.get("/healthz")
+def healthz():
+    healthy = resources["pipeline"].retriever.is_healthy()
+    return JSONResponse({"healthy": healthy}, status_code=200 if healthy else 503)
@@ -0,0 +1,120 @@
+"""Replay a JSONL file of questions through the RAG pipeline.
+
+Each input line is ``{"query": "...", "id": ..., "chat_history": [...]}`` (only
+``query`` is required). Queries are embedded in batches, answered by a bounded
+pool of workers, and chat completions are throttled to ``--rpm``; 429s that
+still happen are retried by the OpenAI client with backoff. One output line is
+written per input line, in input order::
+
+    OPENAI_API_KEY=... PINECONE_API_KEY=... \\
+        python -m butterfly_assistant.batch questions.jsonl answers.jsonl --concurrency 8 --rpm 500
+"""
+
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from openai import OpenAI
+
+from .embedding_cache import normalize_query
+from .pipeline import create_pipeline
+from .settings import OPENAI_API_KEY
+
+
+class RateLimiter:
+    """Token bucket allowing ``per_minute`` calls per minute, shared by all worker threads."""
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+def throttled(client, limiter):
+    """``client`` with chat completions gated by ``limiter`` (embeddings are batched separately)."""
+    def create(**kwargs):
+        limiter.acquire()
+        return client.chat.completions.create(**kwargs)
+
+    return SimpleNamespace(
+        embeddings=client.embeddings,
+        chat=SimpleNamespace(completions=SimpleNamespace(create=create)),
+        close=client.close,
+    )
+
+
+def embed_in_batches(pipeline, queries, batch_size):
+    """Pre-fill the embedding cache with one API call per ``batch_size`` uncached queries."""
+    cache, model = pipeline.embedding_cache, pipeline.embed_model
+    unique = {normalize_query(q): q for q in queries}.values()
+    pending = [q for q in unique if cache.get(q, model) is None]
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        response = pipeline.client.embeddings.create(input=batch, model=model)
+        for text, item in zip(batch, response.data):
+            cache.put(text, model, item.embedding)
+    return len(pending)
+
+
+def answer_record(pipeline, record, threshold):
+    started = time.perf_counter()
+    result = {"id": record.get("id"), "query": record["query"]}
+    try:
+        answer, best_score, context_texts, _, info = pipeline.answer(
+            record["query"], record.get("chat_history", []), threshold=threshold
+        )
+        result.update(answer=answer, best_score=best_score, context_texts=context_texts, **info)
+    except Exception as e:  # one bad record must not sink a multi-hour run
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+def run(input_path, output_path, concurrency=8, rpm=500, embed_batch_size=100, threshold=0.5, max_retries=6):
+    with open(input_path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+
+    client = OpenAI(api_key=OPENAI_API_KEY or None, max_retries=max_retries)
+    pipeline = create_pipeline(client=throttled(client, RateLimiter(rpm)))
+
+    # Embed and answer in windows that fit the embedding cache, so no pre-computed vector is evicted
+    # (and re-embedded one at a time) before its query is answered
+    window = max(embed_batch_size, pipeline.embedding_cache.maxsize // 2)
+    started = time.perf_counter()
+    embedded = errors = answered = 0
+    with open(output_path, "w", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for start in range(0, len(records), window):
+            chunk = records[start:start + window]
+            embedded += embed_in_batches(pipeline, [r["query"] for r in chunk], embed_batch_size)
+            for result in pool.map(lambda r: answer_record(pipeline, r, threshold), chunk):
+                answered += 1
+                errors += "error" in result
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                if answered % 100 == 0 or answered == len(records):
+                    elapsed = time.perf_counter() - started
+                    print(f"{answered}/{len(records)} answered ({answered / elapsed:.1f} q/s, {errors} errors)")
+    print(f"Embedded {embedded} unique queries")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="JSONL of questions")
+    parser.add_argument("output", help="JSONL to write answers to")
+    parser.add_argument("--concurrency", type=int, default=8, help="parallel retrieve+generate workers")
+    parser.add_argument("--rpm", type=int, default=500, help="max chat completions per minute")
+    parser.add_argument("--embed-batch-size", type=int, default=100, help="queries per embeddings call")
+    parser.add_argument("--threshold", type=float, default=0.5, help="best_score needed to use retrieved context")
+    parser.add_argument("--max-retries", type=int, default=6, help="OpenAI client retries on 429/5xx")
+    args = parser.parse_args()
+    run(args.input, args.output, args.concurrency, args.rpm, args.embed_batch_size, args.threshold, args.max_retries)
@@ -0,0 +1,264 @@
+"""Offline, reproducible latency benchmark of the answer pipeline.
+
+Replays a fixed question set through :class:`pipeline.RagPipeline` with every
+external service replaced by a local stand-in:
+
+* embeddings come from a recording (``bench_fixtures/embeddings.npz``, made by
+  ``python -m butterfly_assistant.benchmark record``) or, without one, from a deterministic hashed
+  bag-of-words embedding, so no API key is needed. No recording is committed
+  yet, so until someone records one the hashed vectors are what runs;
+* retrieval runs against a chunk store built from ``bench_fixtures/chunks.jsonl``;
+* the chat model is a fake with a configurable time-to-first-token and token rate.
+
+Each configuration (which optional stages are on) reports p50/p95/p99 latency,
+throughput and peak Python memory::
+
+    python -m butterfly_assistant.benchmark
+    python -m butterfly_assistant.benchmark --configs baseline full --repeats 5 --concurrency 4 --output results.json
+    python -m butterfly_assistant.benchmark --chat-latency-ms 600 --tokens-per-second 60 --stream
+
+Every repeat runs on a fresh pipeline, so the numbers measure the configuration
+rather than its caches. ``--warm`` reuses one pipeline instead: later rounds then
+hit the embedding and answer caches the way repeated questions do in production.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import numpy as np
+
+from .answer_cache import SemanticAnswerCache
+from .bm25 import LexicalIndex, tokenize
+from .chunk_store import ChunkStore, write_chunk_store
+from .compress import ContextCompressor
+from .embedding_cache import EmbeddingCache
+from .local_index import LocalVectorIndex
+from .pipeline import RagPipeline
+from .rerank import LexicalReranker
+from .retrievers import NumpyRetriever
+from .settings import OPENAI_EMBED_MODEL, PINECONE_NAMESPACE
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_fixtures")
+RECORDING = os.path.join(FIXTURE_DIR, "embeddings.npz")
+
+# Hashed bag-of-words vectors score lower than a real embedding model; this threshold
+# plays the role 0.5 plays with text-embedding-3-small
+HASHED_THRESHOLD = 0.2
+
+CONFIGS = {
+    "baseline": {},
+    "hybrid": {"hybrid": True},
+    "rerank": {"rerank": True},
+    "compress": {"compress": True},
+    "full": {"hybrid": True, "rerank": True, "compress": True},
+}
+
+
+def load_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+# ==============================
+# 🎭 Stand-ins for OpenAI
+# ==============================
+def hashed_embedding(text, dim=384):
+    """Deterministic bag-of-words vector (unigrams + bigrams, signed feature hashing), unit length."""
+    tokens = tokenize(text)
+    vector = np.zeros(dim, dtype=np.float32)
+    for feature in [*tokens, *(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))]:
+        digest = hashlib.md5(feature.encode("utf-8")).digest()
+        vector[int.from_bytes(digest[:4], "little") % dim] += 1.0 if digest[4] & 1 else -1.0
+    norm = np.linalg.norm(vector)
+    return (vector / norm if norm else vector).tolist()
+
+
+class RecordedEmbeddings:
+    """``client.embeddings`` returning recorded vectors (hashed ones for unrecorded texts)."""
+
+    def __init__(self, recording=None, latency_ms=0.0):
+        self.vectors = {}
+        if recording and os.path.exists(recording):
+            data = np.load(recording)
+            self.vectors = dict(zip(data["texts"].tolist(), data["vectors"].tolist()))
+        self.latency = latency_ms / 1000
+
+    def vector(self, text):
+        return self.vectors.get(text) or hashed_embedding(text)
+
+    def create(self, input, model):
+        time.sleep(self.latency)
+        texts = input if isinstance(input, list) else [input]
+        return SimpleNamespace(data=[SimpleNamespace(embedding=self.vector(t)) for t in texts])
+
+
+class FakeChatCompletions:
+    """``client.chat.completions`` answering after ``latency_ms`` at ``tokens_per_second``."""
+
+    def __init__(self, latency_ms=400.0, tokens_per_second=80.0, answer_tokens=80):
+        self.latency = latency_ms / 1000
+        self.token_interval = 1 / tokens_per_second
+        self.answer_tokens = answer_tokens
+
+    def _tokens(self, messages):
+        words = messages[-1]["content"].split() or ["ok"]
+        return [words[i % len(words)] + " " for i in range(self.answer_tokens)]
+
+    def create(self, model, messages, temperature=None, stream=False, **_):
+        tokens = self._tokens(messages)
+        time.sleep(self.latency)
+        if stream:
+            return self._stream(tokens)
+        time.sleep(self.token_interval * len(tokens))
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="".join(tokens)))])
+
+    def _stream(self, tokens):
+        for token in tokens:
+            time.sleep(self.token_interval)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=token))])
+
+
+def fake_client(embeddings, completions):
+    return SimpleNamespace(embeddings=embeddings, chat=SimpleNamespace(completions=completions))
+
+
+# ==============================
+# 🏗️ Fixture pipeline
+# ==============================
+def build_store(chunks, embeddings, directory):
+    write_chunk_store(
+        directory,
+        PINECONE_NAMESPACE,
+        [c["id"] for c in chunks],
+        [embeddings.vector(c["text_content"]) for c in chunks],
+        [{k: v for k, v in c.items() if k != "id"} for c in chunks],
+    )
+    return directory
+
+
+def build_pipeline(config, store_dir, client):
+    store = ChunkStore(store_dir)
+    return RagPipeline(
+        client,
+        NumpyRetriever(LocalVectorIndex(store_dir)),
+        EmbeddingCache(maxsize=2048),
+        SemanticAnswerCache(),
+        lexical_index=LexicalIndex(store) if config.get("hybrid") else None,
+        reranker=LexicalReranker() if config.get("rerank") else None,
+        compressor=ContextCompressor.from_store(store) if config.get("compress") else None,
+    )
+
+
+def ask(pipeline, question, threshold, stream):
+    started = time.perf_counter()
+    answer, best_score, _, _, info = pipeline.answer(question["query"], [], threshold=threshold, stream=stream)
+    if stream:
+        answer = "".join(answer)  # a user waits for the last token
+    return time.perf_counter() - started, best_score < threshold, info["prompt_tokens"]
+
+
+def run_config(name, config, questions, store_dir, client, threshold, repeats=3, concurrency=1, stream=False,
+               warm=False):
+    shared = build_pipeline(config, store_dir, client) if warm else None
+    results, wall = [], 0.0
+    for _ in range(repeats):
+        pipeline = shared or build_pipeline(config, store_dir, client)  # cold caches unless warm
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results.extend(pool.map(lambda q: ask(pipeline, q, threshold, stream), questions))
+        wall += time.perf_counter() - started
+
+    # Memory in a separate pass on a fresh pipeline: tracemalloc would distort the timings
+    tracemalloc.start()
+    memory_pipeline = build_pipeline(config, store_dir, client)
+    for q in questions:
+        ask(memory_pipeline, q, threshold, stream)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies = np.array([r[0] for r in results]) * 1000
+    return {
+        "config": name,
+        "queries": len(results),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "throughput_qps": len(results) / wall,
+        "fallback_rate": float(np.mean([r[1] for r in results])),
+        "mean_prompt_tokens": float(np.mean([r[2] for r in results])),
+        "peak_memory_mb": peak / 2**20,
+    }
+
+
+def record(questions, chunks, path=RECORDING):
+    """Embed the fixture with the real model once, so later runs replay genuine vectors offline."""
+    from openai import OpenAI
+
+    from .settings import OPENAI_API_KEY
+
+    client = OpenAI(api_key=OPENAI_API_KEY or None)
+    texts = sorted({q["query"] for q in questions} | {c["text_content"] for c in chunks})
+    vectors = []
+    for start in range(0, len(texts), 100):
+        response = client.embeddings.create(input=texts[start:start + 100], model=OPENAI_EMBED_MODEL)
+        vectors.extend(item.embedding for item in response.data)
+    np.savez_compressed(path, texts=np.array(texts), vectors=np.array(vectors, dtype=np.float32))
+    print(f"Recorded {len(texts)} embeddings to {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", nargs="?", choices=["run", "record"], default="run")
+    parser.add_argument("--questions", default=os.path.join(FIXTURE_DIR, "questions.jsonl"))
+    parser.add_argument("--chunks", default=os.path.join(FIXTURE_DIR, "chunks.jsonl"))
+    parser.add_argument("--embeddings", default=RECORDING, help="recorded embeddings (.npz)")
+    parser.add_argument("--configs", nargs="+", choices=list(CONFIGS), default=list(CONFIGS))
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--warm", action="store_true", help="reuse one pipeline (and its caches) across repeats")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--threshold", type=float, help="default: 0.5 with recorded embeddings, else 0.2")
+    parser.add_argument("--embed-latency-ms", type=float, default=0.0)
+    parser.add_argument("--chat-latency-ms", type=float, default=400.0, help="time to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=80.0)
+    parser.add_argument("--answer-tokens", type=int, default=80)
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args()
+
+    questions, chunks = load_jsonl(args.questions), load_jsonl(args.chunks)
+    if args.command == "record":
+        record(questions, chunks, args.embeddings)
+        raise SystemExit
+
+    embeddings = RecordedEmbeddings(args.embeddings, args.embed_latency_ms)
+    threshold = args.threshold if args.threshold is not None else (0.5 if embeddings.vectors else HASHED_THRESHOLD)
+    client = fake_client(
+        embeddings, FakeChatCompletions(args.chat_latency_ms, args.tokens_per_second, args.answer_tokens)
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        store_dir = build_store(chunks, embeddings, os.path.join(tmp, "store"))
+        report = [
+            run_config(name, CONFIGS[name], questions, store_dir, client, threshold,
+                       args.repeats, args.concurrency, args.stream, args.warm)
+            for name in args.configs
+        ]
+
+    print(
+        f"{'config':<10} {'p50':>9} {'p95':>9} {'p99':>9} {'q/s':>7} {'fallback':>9} {'prompt tok':>11} {'peak MB':>8}"
+    )
+    for r in report:
+        print(
+            f"{r['config']:<10} {r['p50_ms']:>7.1f}ms {r['p95_ms']:>7.1f}ms {r['p99_ms']:>7.1f}ms "
+            f"{r['throughput_qps']:>7.2f} {r['fallback_rate']:>9.0%} {r['mean_prompt_tokens']:>11.0f} "
+            f"{r['peak_memory_mb']:>8.2f}"
+        )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1)
@@ -0,0 +1,108 @@
+"""In-memory BM25 index over the chunk store, for hybrid lexical + vector retrieval.
+
+Dense embeddings blur exact part names ("L298N", "servo horn", "5in1"); BM25
+matches them literally. The index is built once from a :class:`ChunkStore`
+and a query touches only the postings of its own terms, so it runs in
+microseconds next to the vector search. Results of both are merged with
+reciprocal-rank fusion, and when the lexical match alone is clearly good
+enough the embedding call can be skipped altogether.
+"""
+
+import math
+import re
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from .local_index import Match
+
+STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from how i if in into is it its me my of on or "
+    "so that the their then there these this to was what when where which who why will with you your".split()
+)
+
+
+def tokenize(text):
+    return [t for t in re.findall(r"[a-z0-9]+", text.lower()) if t not in STOPWORDS]
+
+
+class LexicalIndex:
+    def __init__(self, store, k1=1.5, b=0.75):
+        self.store = store
+        self.k1 = k1
+        self.b = b
+
+        postings = defaultdict(list)
+        lengths = np.zeros(len(store), dtype=np.float32)
+        for row in range(len(store)):
+            counts = Counter(tokenize(store.text(row)))
+            lengths[row] = sum(counts.values())
+            for term, tf in counts.items():
+                postings[term].append((row, tf))
+
+        n = max(len(store), 1)
+        self.average_length = float(lengths.mean()) if len(store) else 0.0
+        self.lengths = lengths
+        self.postings = {
+            term: (np.array([r for r, _ in rows], dtype=np.int64), np.array([tf for _, tf in rows], dtype=np.float32))
+            for term, rows in postings.items()
+        }
+        self.idf = {term: math.log(1 + (n - len(rows) + 0.5) / (len(rows) + 0.5)) for term, rows in postings.items()}
+        # A term no chunk contains is as informative as the rarest possible one
+        self.max_idf = math.log(1 + (n - 0.5) / 1.5)
+
+    def search(self, query, top_k, rows=None):
+        """``(row, score)`` pairs of the best BM25 matches, optionally limited to ``rows``."""
+        scores = np.zeros(len(self.store), dtype=np.float32)
+        for term in set(tokenize(query)):
+            if term not in self.postings:
+                continue
+            term_rows, tf = self.postings[term]
+            norm = self.k1 * (1 - self.b + self.b * self.lengths[term_rows] / (self.average_length or 1.0))
+            scores[term_rows] += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+        if rows is not None:
+            mask = np.zeros(len(scores), dtype=bool)
+            mask[rows] = True
+            scores[~mask] = 0
+        hits = np.flatnonzero(scores)
+        best = hits[np.argsort(-scores[hits])][:top_k]
+        return [(int(r), float(scores[r])) for r in best]
+
+    def coverage(self, query, row):
+        """Share of the query's IDF mass that appears in chunk ``row`` (1.0 = every term found)."""
+        terms = set(tokenize(query))
+        if not terms:
+            return 0.0
+        found = set(tokenize(self.store.text(row)))
+        total = sum(self.idf.get(t, self.max_idf) for t in terms)
+        return sum(self.idf.get(t, self.max_idf) for t in terms & found) / total
+
+    def confident(self, query, results, min_coverage=0.9, min_margin=1.5, rare_share=0.8):
+        """True when the top lexical hit is good enough to answer from without embeddings.
+
+        It must contain (nearly) every query term, including at least one rare one such
+        as a part name (IDF within ``rare_share`` of the maximum), and clearly beat the
+        runner-up.
+        """
+        if not results:
+            return False
+        top_row, top_score = results[0]
+        if len(results) > 1 and top_score < min_margin * results[1][1]:
+            return False
+        rare = [t for t in set(tokenize(query)) if self.idf.get(t, 0.0) >= rare_share * self.max_idf]
+        found = set(tokenize(self.store.text(top_row)))
+        return any(t in found for t in rare) and self.coverage(query, top_row) >= min_coverage
+
+    def matches(self, results):
+        return [Match(id=self.store.ids[row], score=score, metadata=self.store.metadata(row)) for row, score in results]
+
+
+def reciprocal_rank_fusion(match_lists, top_k, k=60):
+    """Merge ranked lists by summed ``1 / (k + rank)``; each match's score becomes its fused score."""
+    fused, first_seen = defaultdict(float), {}
+    for matches in match_lists:
+        for rank, m in enumerate(matches, 1):
+            fused[m.id] += 1.0 / (k + rank)
+            first_seen.setdefault(m.id, m)
+    ranked = sorted(fused, key=fused.get, reverse=True)[:top_k]
+    return [Match(id=i, score=fused[i], metadata=first_seen[i].metadata) for i in ranked]
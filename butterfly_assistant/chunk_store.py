@@ -0,0 +1,123 @@
+"""Compact on-disk store of chunk texts and vectors, addressed by chunk ID.
+
+A store is a directory of four files:
+
+* ``vectors.npy`` – unit-normalised float32 matrix, one row per chunk
+* ``texts.bin``   – every chunk's UTF-8 text, back to back
+* ``offsets.npy`` – int64 byte offsets into ``texts.bin`` (one more than rows)
+* ``chunks.json`` – namespace, IDs and the remaining (small) metadata per row
+
+The two ``.npy`` files and ``texts.bin`` are memory-mapped, so opening a store
+is cheap and a text is read straight out of the page cache when it is needed.
+
+The store's path is a symlink to the current version (``<path>.v<n>``);
+:func:`write_chunk_store` writes a new version next to it and swaps the link.
+"""
+
+import json
+import mmap
+import os
+import shutil
+import time
+
+import numpy as np
+
+VECTORS_FILE = "vectors.npy"
+TEXTS_FILE = "texts.bin"
+OFFSETS_FILE = "offsets.npy"
+CHUNKS_FILE = "chunks.json"
+TEXT_KEY = "text_content"
+
+
+class ChunkStore:
+    def __init__(self, directory):
+        self.directory = directory
+        directory = os.path.realpath(directory)  # read every file from the same version
+        with open(os.path.join(directory, CHUNKS_FILE), encoding="utf-8") as f:
+            chunks = json.load(f)
+        self.namespace = chunks["namespace"]
+        self.ids = chunks["ids"]
+        self._metadata = chunks["metadata"]
+        self.rows = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+
+        self.vectors = np.load(os.path.join(directory, VECTORS_FILE), mmap_mode="r")
+        self.offsets = np.load(os.path.join(directory, OFFSETS_FILE), mmap_mode="r")
+        with open(os.path.join(directory, TEXTS_FILE), "rb") as f:
+            # mmap refuses empty files; an empty store has no text to read anyway
+            self._texts = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.offsets[-1] else b""
+
+    @staticmethod
+    def exists(directory):
+        return all(
+            os.path.exists(os.path.join(directory, name))
+            for name in (VECTORS_FILE, TEXTS_FILE, OFFSETS_FILE, CHUNKS_FILE)
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, chunk_id):
+        return chunk_id in self.rows
+
+    def text(self, row):
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return str(memoryview(self._texts)[start:end], "utf-8")
+
+    def metadata(self, row):
+        """The row's metadata with ``text_content`` filled in from ``texts.bin``."""
+        return {**self._metadata[row], TEXT_KEY: self.text(row)}
+
+    def metadata_for(self, chunk_id):
+        return self.metadata(self.rows[chunk_id])
+
+    def rows_where(self, field, value):
+        """Row numbers whose metadata ``field`` equals ``value``."""
+        return np.flatnonzero([m.get(field) == value for m in self._metadata])
+
+
+def write_chunk_store(directory, namespace, ids, vectors, metadata):
+    """Write a new version of a store and point ``directory`` at it with one atomic rename.
+
+    Readers see either the old store or the new one, never a mix or a missing path.
+    The replaced version is kept for readers that resolved the link just before the
+    swap; older versions are deleted. ``metadata`` is one dict per chunk; its
+    ``text_content`` goes to ``texts.bin``.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    vectors = vectors.reshape(len(ids), -1) if len(ids) else np.empty((0, 0), dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = vectors / np.where(norms == 0, 1.0, norms)
+
+    encoded = [m.get(TEXT_KEY, "").encode("utf-8") for m in metadata]
+    offsets = np.zeros(len(ids) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(t) for t in encoded])
+    rest = [{k: v for k, v in m.items() if k != TEXT_KEY} for m in metadata]
+
+    base = directory.rstrip(os.sep)
+    version = f"{base}.v{time.time_ns()}"
+    os.makedirs(version)
+    np.save(os.path.join(version, VECTORS_FILE), vectors)
+    np.save(os.path.join(version, OFFSETS_FILE), offsets)
+    with open(os.path.join(version, TEXTS_FILE), "wb") as f:
+        f.writelines(encoded)
+    with open(os.path.join(version, CHUNKS_FILE), "w", encoding="utf-8") as f:
+        json.dump({"namespace": namespace, "ids": list(ids), "metadata": rest}, f, ensure_ascii=False)
+
+    previous = os.path.realpath(base) if os.path.exists(base) else None
+    if previous is not None and not os.path.islink(base):
+        # A store written before versioning: move it aside (the one non-atomic step, done once)
+        previous = os.path.realpath(f"{base}.v0")
+        os.rename(base, previous)
+    link = f"{base}.link"
+    if os.path.lexists(link):
+        os.remove(link)
+    os.symlink(os.path.basename(version), link)  # relative, so the index directory can be moved
+    os.replace(link, base)
+
+    keep = {os.path.realpath(version), previous}
+    parent = os.path.dirname(base) or "."
+    prefix = f"{os.path.basename(base)}.v"
+    for name in os.listdir(parent):
+        path = os.path.join(parent, name)
+        if name.startswith(prefix) and os.path.realpath(path) not in keep:
+            shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,125 @@
+"""Client for the HTTP API in api.py, with the same interface app.py uses for a local pipeline.
+
+``RemotePipeline.answer`` returns the usual ``(answer, best_score, context_texts,
+fallback_response, info)`` tuple; with ``stream=True`` the answer is a generator of
+text chunks and everything else is available as soon as retrieval is done.
+The ``session`` and ``summary`` objects stay in ``st.session_state`` and are
+updated from the server's responses, so the service itself keeps no per-chat state.
+"""
+
+import json
+
+import httpx
+
+
+def _events(lines):
+    """Parse server-sent events into ``(event, data)`` pairs."""
+    name, data = "message", []
+    for line in lines:
+        if not line:
+            if data:
+                yield name, json.loads("\n".join(data))
+            name, data = "message", []
+        elif line.startswith("event:"):
+            name = line[6:].strip()
+        elif line.startswith("data:"):
+            data.append(line[5:].strip())
+
+
+class RemotePipeline:
+    def __init__(self, base_url, timeout=60.0):
+        self.http = httpx.Client(base_url=base_url.rstrip("/"), timeout=timeout)
+
+    def is_closed(self):
+        return self.http.is_closed
+
+    def close(self):
+        self.http.close()
+
+    def answer(self, user_query, chat_history, threshold=0.5, max_history_turns=10, stream=False, summary=None,
+               kit=None, session=None, trace=None):
+        payload = {
+            "query": user_query,
+            "chat_history": [{"role": m["role"], "content": m["content"]} for m in chat_history],
+            "threshold": threshold,
+            "max_history_turns": max_history_turns,
+            "kit": kit,
+        }
+        if summary is not None:
+            text, covered = summary.snapshot()
+            payload["summary"] = {"text": text, "covered": covered}
+        if session is not None:
+            payload["session"] = session.state()
+
+        span = trace.start("api", stream=stream) if trace is not None else None
+        if not stream:
+            response = self.http.post("/v1/answer", json=payload)
+            response.raise_for_status()
+            data = response.json()
+            if span is not None:
+                span.end()
+            return self._unpack(data, session, data["answer"])
+
+        request = self.http.stream("POST", "/v1/answer/stream", json=payload)
+        response = request.__enter__()
+        try:
+            response.raise_for_status()
+            events = _events(response.iter_lines())
+            _, meta = next(events)
+        except BaseException:
+            request.__exit__(None, None, None)
+            raise
+
+        def tokens():
+            try:
+                for name, data in events:
+                    if name == "token":
+                        yield data["text"]
+                    elif name == "error":
+                        raise RuntimeError(data["detail"])
+            finally:
+                request.__exit__(None, None, None)
+                if span is not None:
+                    span.end()
+
+        return self._unpack(meta, session, tokens())
+
+    @staticmethod
+    def _unpack(data, session, answer):
+        if session is not None:
+            session.restore(data["session"])
+        return answer, data["best_score"], data["context_texts"], data["fallback_response"], data["info"]
+
+    def summarise_in_background(self, summary, chat_history, keep_recent_messages):
+        text, covered = summary.snapshot()
+        payload = {
+            "chat_history": [{"role": m["role"], "content": m["content"]} for m in chat_history],
+            "keep_recent_messages": keep_recent_messages,
+            "summary": {"text": text, "covered": covered},
+        }
+        # Same in-flight guard as a local summary: at most one summarisation per chat at a time
+        summary.run_in_background(self._summarise, summary, payload)
+
+    def _summarise(self, summary, payload):
+        response = self.http.post("/v1/summary", json=payload)
+        response.raise_for_status()
+        data = response.json()
+        summary.restore(data["text"], data["covered"])
+
+
+class RemoteQueryLog:
+    """Stand-in for tuning.QueryLog that sends labels to the API's query log.
+
+    ``get_pipeline`` returns the current :class:`RemotePipeline`; it is looked up on
+    every call because the app replaces a pipeline whose connection failed.
+    """
+
+    def __init__(self, get_pipeline):
+        self.get_pipeline = get_pipeline
+
+    def label(self, query_id, answerable=None, useful_chunks=None, helpful=None):
+        payload = {"query_id": query_id, "answerable": answerable, "useful_chunks": useful_chunks, "helpful": helpful}
+        try:
+            self.get_pipeline().http.post("/v1/feedback", json=payload).raise_for_status()
+        except httpx.HTTPError as e:
+            print(f"Feedback not recorded: {e}")
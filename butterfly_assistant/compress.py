@@ -0,0 +1,89 @@
+"""Trim retrieved chunks down to what the question needs before they enter the prompt.
+
+Neighbouring chunks of a manual overlap (ingest.py carries trailing paragraphs
+into the next chunk) and many repeat the same safety notices and kit headers.
+:class:`ContextCompressor` drops chunks that are mostly repeats of an earlier
+one, removes sentences already included or known to be boilerplate (repeated
+across many chunks of the corpus), and within each chunk keeps only the
+sentences that share terms with the question (plus their neighbours, so a step
+keeps its lead-in). A chunk with no overlapping sentence at all was retrieved
+on meaning alone and is kept whole.
+"""
+
+import re
+
+from .bm25 import tokenize
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+_STEP_MARKER = re.compile(r"^(?:\d+|[a-z])[.)]$", re.IGNORECASE)
+
+
+def split_sentences(text):
+    """Sentences and bullet/step lines, in order."""
+    sentences = []
+    for s in _SENTENCE_END.split(text):
+        s = s.strip()
+        if sentences and _STEP_MARKER.match(sentences[-1]):
+            sentences[-1] = f"{sentences[-1]} {s}"  # "2." belongs to the step that follows it
+        elif s:
+            sentences.append(s)
+    return sentences
+
+
+def _normalize(sentence):
+    return " ".join(tokenize(sentence))
+
+
+def _shingles(tokens, n=5):
+    if len(tokens) < n:
+        return {tuple(tokens)} if tokens else set()
+    return {tuple(tokens[i:i + n]) for i in range(len(tokens) - n + 1)}
+
+
+def find_boilerplate(texts, min_chunks=3):
+    """Normalised sentences that occur in at least ``min_chunks`` different chunks."""
+    counts = {}
+    for text in texts:
+        for sentence in {_normalize(s) for s in split_sentences(text)}:
+            counts[sentence] = counts.get(sentence, 0) + 1
+    return frozenset(s for s, n in counts.items() if s and n >= min_chunks)
+
+
+class ContextCompressor:
+    def __init__(self, boilerplate=frozenset(), max_overlap=0.8, neighbours=1):
+        self.boilerplate = boilerplate
+        self.max_overlap = max_overlap  # share of a chunk's 5-word shingles already seen before it is dropped
+        self.neighbours = neighbours
+
+    @classmethod
+    def from_store(cls, store, **kwargs):
+        return cls(find_boilerplate(store.text(row) for row in range(len(store))), **kwargs)
+
+    def compress(self, query, texts):
+        query_terms = set(tokenize(query))
+        # Boilerplate the question actually asks about (e.g. a safety question) is kept once
+        seen_sentences = {b for b in self.boilerplate if not query_terms & set(b.split())}
+        seen_shingles, compressed = set(), []
+        for text in texts:
+            shingles = _shingles(tokenize(text))
+            if shingles and len(shingles & seen_shingles) / len(shingles) >= self.max_overlap:
+                continue  # a near-duplicate of a chunk already included
+            seen_shingles |= shingles
+
+            sentences = [s for s in split_sentences(text) if _normalize(s) not in seen_sentences]
+            seen_sentences.update(_normalize(s) for s in sentences)
+            if not sentences:
+                continue
+
+            relevant = [i for i, s in enumerate(sentences) if query_terms & set(tokenize(s))]
+            if relevant:
+                keep = {
+                    j
+                    for i in relevant
+                    for j in range(i - self.neighbours, i + self.neighbours + 1)
+                    if 0 <= j < len(sentences)
+                }
+                sentences = [s for i, s in enumerate(sentences) if i in keep]
+            compressed.append("\n".join(sentences))
+        # Chunks made only of boilerplate compress to nothing; the best one still beats an empty prompt
+        return compressed or texts[:1]
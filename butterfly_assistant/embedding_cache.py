@@ -0,0 +1,96 @@
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+
+
+def normalize_query(text):
+    """Collapse case, whitespace and trailing punctuation so near-identical questions share a key."""
+    return " ".join(text.casefold().split()).rstrip("?!. ")
+
+
+class EmbeddingCache:
+    """Exact-match query embedding cache.
+
+    An in-process LRU (bounded by ``maxsize``) sits in front of an optional
+    SQLite file that can be shared by several Streamlit workers.
+    """
+
+    def __init__(self, maxsize=2048, path=None):
+        self.maxsize = maxsize
+        self.path = path
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " model TEXT NOT NULL,"
+                " key TEXT NOT NULL,"
+                " vector BLOB NOT NULL,"
+                " PRIMARY KEY (model, key))"
+            )
+            self._db.commit()
+
+    def get(self, text, model):
+        key = (model, normalize_query(text))
+        with self._lock:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                self.hits += 1
+                return self._lru[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT vector FROM embeddings WHERE model = ? AND key = ?", key
+                ).fetchone()
+                if row is not None:
+                    vector = array("f", row[0]).tolist()
+                    self._remember(key, vector)
+                    self.disk_hits += 1
+                    return vector
+
+            self.misses += 1
+            return None
+
+    def put(self, text, model, vector):
+        key = (model, normalize_query(text))
+        with self._lock:
+            self._remember(key, list(vector))
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO embeddings (model, key, vector) VALUES (?, ?, ?)",
+                    (*key, array("f", vector).tobytes()),
+                )
+                self._db.commit()
+
+    def get_or_create(self, text, model, create):
+        """Return the cached embedding for ``text`` or call ``create()`` and store its result."""
+        vector = self.get(text, model)
+        if vector is None:
+            vector = create()
+            self.put(text, model, vector)
+        return vector
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "size": len(self._lru),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+
+    def _remember(self, key, vector):
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.maxsize:
+            self._lru.popitem(last=False)
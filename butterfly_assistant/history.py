@@ -0,0 +1,143 @@
+# ==============================
+# 🧠 Chat history budgeting
+# ==============================
+import threading
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:  # fall back to a character heuristic
+    tiktoken = None
+
+# Per-message framing tokens added by the chat format (role, separators), and the
+# tokens that prime the assistant's reply. Same figures as OpenAI's cookbook.
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REPLY = 3
+
+
+@lru_cache(maxsize=None)
+def _encoding(model):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:  # the BPE file could not be downloaded (offline)
+        return None
+
+
+def count_text_tokens(text, model):
+    encoding = _encoding(model)
+    if encoding is None:
+        return max(1, len(text) // 4) if text else 0
+    return len(encoding.encode(text))
+
+
+def count_message_tokens(message, model):
+    return TOKENS_PER_MESSAGE + count_text_tokens(message.get("content") or "", model)
+
+
+def count_prompt_tokens(messages, model):
+    return sum(count_message_tokens(m, model) for m in messages) + TOKENS_PER_REPLY
+
+
+def trim_history(chat_history, max_turns, max_tokens, model):
+    """Keep the most recent messages that fit both ``max_turns`` (user+assistant pairs) and ``max_tokens``.
+
+    Trimming walks back from the newest message and stops at the first one that does not
+    fit, so the kept history is always a contiguous, most-recent slice.
+    """
+    kept, used = [], 0
+    for message in reversed(chat_history[-2 * max_turns:] if max_turns else []):
+        tokens = count_message_tokens(message, model)
+        if used + tokens > max_tokens:
+            break
+        kept.append(message)
+        used += tokens
+    kept.reverse()
+
+    # Don't open the history with an orphaned assistant reply
+    if kept and kept[0].get("role") == "assistant":
+        kept = kept[1:]
+    return kept
+
+
+# ==============================
+# 📝 Rolling conversation summary
+# ==============================
+SUMMARY_INSTRUCTION = (
+    "You keep a running summary of a chat between a helper and a kid or parent building "
+    "Butterfly Fields DIY kits. Merge the new messages into the existing summary. Keep kit names, "
+    "steps already completed, problems reported and anything the helper promised. "
+    "Stay under 120 words. Reply with the updated summary only."
+)
+
+
+class ConversationSummary:
+    """Older turns of one chat, compacted into a running summary.
+
+    ``covered`` counts how many leading messages of the chat history the summary
+    already includes; the pipeline sends the summary plus only the messages after it.
+    Updates run on a background thread once the answer has been shown, so they never
+    sit on the critical path of a question.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.covered = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def snapshot(self):
+        with self._lock:
+            return self.text, self.covered
+
+    def restore(self, text, covered):
+        """Adopt a summary built elsewhere (e.g. by the API service), unless this one is newer."""
+        with self._lock:
+            if covered >= self.covered:
+                self.text, self.covered = text, covered
+
+    def due(self, chat_history, keep_recent_messages, batch_messages):
+        """True when at least ``batch_messages`` have aged out of the recent window."""
+        return len(chat_history) - keep_recent_messages - self.covered >= batch_messages
+
+    def update(self, client, model, chat_history, keep_recent_messages):
+        text, covered = self.snapshot()
+        upto = len(chat_history) - keep_recent_messages
+        if upto % 2:  # fold whole user+assistant turns only
+            upto -= 1
+        if upto <= covered:
+            return
+
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in chat_history[covered:upto])
+        response = client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": SUMMARY_INSTRUCTION},
+                {"role": "user", "content": f"Existing summary:\n{text or '(none)'}\n\nNew messages:\n{transcript}"},
+            ],
+            temperature=0,
+            max_tokens=200,
+        )
+        with self._lock:
+            if self.covered == covered:  # a concurrent update may have won the race
+                self.text = response.choices[0].message.content.strip()
+                self.covered = upto
+
+    def update_in_background(self, client, model, chat_history, keep_recent_messages):
+        self.run_in_background(self.update, client, model, list(chat_history), keep_recent_messages)
+
+    def run_in_background(self, update, *args):
+        """Run ``update(*args)`` on a daemon thread, unless an update of this summary is still in flight."""
+        if self._thread is not None and self._thread.is_alive():
+            return  # the next answer will pick up whatever is left
+        self._thread = threading.Thread(target=self._update_quietly, args=(update, *args), daemon=True)
+        self._thread.start()
+
+    def _update_quietly(self, update, *args):
+        try:
+            update(*args)
+        except Exception as e:  # the raw history is still there; try again after the next answer
+            print(f"Conversation summary update failed: {e}")
@@ -0,0 +1,321 @@
+"""Build the ``diy_kit_support_chunks`` namespace from kit manuals.
+
+Manuals (PDF, Markdown or plain text) are split into paragraph-aligned chunks,
+embedded in batches with ``text-embedding-3-small`` and upserted to Pinecone by
+a pool of workers. Each chunk carries ``text_content``, ``kit``, ``source`` and
+``chunk_index`` metadata. The kit is the manual's parent folder name unless
+``--kit`` is given, so a tree like ``manuals/Fun With Magnets/guide.pdf`` works
+as-is::
+
+    OPENAI_API_KEY=... PINECONE_API_KEY=... python -m butterfly_assistant.ingest manuals/
+
+Re-indexing is incremental. Chunk IDs are derived from a hash of the chunk
+text (also stored as ``content_hash`` metadata), and a local manifest records
+which IDs each manual currently has in the index. A re-run only embeds chunks
+whose text is new, deletes chunks that disappeared from a manual (or whole
+manuals that disappeared from the scanned folders, e.g. a deleted file or a
+renamed kit folder), and leaves everything else alone. The manifest is saved after every batch, so an interrupted run
+picks up where it stopped.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from openai import OpenAI
+from pinecone import Pinecone
+
+from .history import count_text_tokens
+from .settings import OPENAI_API_KEY, OPENAI_EMBED_MODEL, PINECONE_API_KEY, PINECONE_INDEX_NAME, PINECONE_NAMESPACE
+
+MANUAL_EXTENSIONS = (".pdf", ".md", ".markdown", ".txt")
+
+
+# ==============================
+# 📄 Parsing
+# ==============================
+def read_manual(path):
+    if path.lower().endswith(".pdf"):
+        try:
+            from pypdf import PdfReader
+        except ImportError as e:
+            raise ImportError("Reading PDF manuals needs pypdf: pip install pypdf") from e
+        return "\n\n".join(page.extract_text() or "" for page in PdfReader(path).pages)
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def find_manuals(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in sorted(files):
+                    if name.lower().endswith(MANUAL_EXTENSIONS):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+# ==============================
+# ✂️ Chunking
+# ==============================
+def split_paragraphs(text, max_tokens):
+    """Blank-line separated paragraphs; over-long ones are split at sentence ends."""
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = " ".join(paragraph.split())
+        if not paragraph:
+            continue
+        if count_text_tokens(paragraph, OPENAI_EMBED_MODEL) <= max_tokens:
+            yield paragraph
+            continue
+        sentence_run = ""
+        for sentence in re.split(r"(?<=[.!?])\s+", paragraph):
+            candidate = f"{sentence_run} {sentence}".strip()
+            if sentence_run and count_text_tokens(candidate, OPENAI_EMBED_MODEL) > max_tokens:
+                yield sentence_run
+                candidate = sentence
+            sentence_run = candidate
+        if sentence_run:
+            yield sentence_run
+
+
+def chunk_text(text, max_tokens=300, overlap_tokens=50):
+    """Pack paragraphs into chunks of up to ``max_tokens``, repeating trailing
+    paragraphs worth up to ``overlap_tokens`` at the start of the next chunk."""
+    chunks, current, size = [], [], 0
+    for paragraph in split_paragraphs(text, max_tokens):
+        tokens = count_text_tokens(paragraph, OPENAI_EMBED_MODEL)
+        if current and size + tokens > max_tokens:
+            chunks.append("\n\n".join(current))
+            carried, carried_size = [], 0
+            for previous in reversed(current):
+                previous_size = count_text_tokens(previous, OPENAI_EMBED_MODEL)
+                if carried_size + previous_size > overlap_tokens:
+                    break
+                carried.insert(0, previous)
+                carried_size += previous_size
+            current, size = carried, carried_size
+        current.append(paragraph)
+        size += tokens
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def slugify(text):
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def manual_chunks(path, kit=None, max_tokens=300, overlap_tokens=50):
+    kit = kit or os.path.basename(os.path.dirname(os.path.abspath(path)))
+    source = os.path.basename(path)
+    prefix = f"{slugify(kit)}-{slugify(os.path.splitext(source)[0])}"
+    seen = set()
+    for i, text in enumerate(chunk_text(read_manual(path), max_tokens, overlap_tokens)):
+        digest = content_hash(text)
+        chunk_id = f"{prefix}-{digest[:16]}"
+        if chunk_id in seen:  # the same text twice in one manual
+            chunk_id = f"{chunk_id}-{i:04d}"
+        seen.add(chunk_id)
+        yield {
+            "id": chunk_id,
+            "text": text,
+            "path": os.path.abspath(path),
+            "metadata": {
+                "text_content": text,
+                "kit": kit,
+                "source": source,
+                "chunk_index": i,
+                "content_hash": digest,
+            },
+        }
+
+
+def source_key(chunk):
+    return f"{chunk['metadata']['kit']}/{chunk['metadata']['source']}"
+
+
+# ==============================
+# 🧾 Manifest
+# ==============================
+class Manifest:
+    """What the index holds per manual: ``{"<kit>/<source>": {chunk_id: {"hash", "chunk_index"}}}``,
+    plus the file each manual was read from, to notice manuals that are gone."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.sources = {}
+        self.paths = {}  # "<kit>/<source>" -> absolute path of the manual
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            if "sources" in data:
+                self.sources, self.paths = data["sources"], data.get("paths", {})
+            else:  # written before paths were recorded; they are filled in by the next run
+                self.sources = data
+
+    def chunks(self, source):
+        return self.sources.get(source, {})
+
+    def add(self, chunks):
+        with self._lock:
+            for c in chunks:
+                self.sources.setdefault(source_key(c), {})[c["id"]] = {
+                    "hash": c["metadata"]["content_hash"],
+                    "chunk_index": c["metadata"]["chunk_index"],
+                }
+            self._save()
+
+    def set_paths(self, paths):
+        with self._lock:
+            self.paths.update(paths)
+            self._save()
+
+    def remove(self, source, ids):
+        with self._lock:
+            entries = self.sources.get(source, {})
+            for chunk_id in ids:
+                entries.pop(chunk_id, None)
+            if not entries:
+                self.sources.pop(source, None)
+                self.paths.pop(source, None)
+            self._save()
+
+    def _save(self):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"sources": self.sources, "paths": self.paths}, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
+
+
+def under(path, roots):
+    return any(path == root or path.startswith(root.rstrip(os.sep) + os.sep) for root in roots)
+
+
+def plan_changes(chunks, manifest, roots=(), full=False):
+    """Split chunks into (to_embed, to_renumber, to_delete) against the manifest.
+
+    Manuals in the manifest that were read from under one of ``roots`` but
+    produced no chunks this run (deleted, renamed, emptied) are deleted whole.
+    ``full`` re-embeds every chunk but still deletes the ones the manifest has
+    and this run doesn't, so nothing stale is left in the index.
+    """
+    by_source = {}
+    for c in chunks:
+        by_source.setdefault(source_key(c), []).append(c)
+
+    to_embed, to_renumber, to_delete = [], [], {}
+    for source, source_chunks in by_source.items():
+        indexed = manifest.chunks(source)
+        for c in source_chunks:
+            if full or c["id"] not in indexed:
+                to_embed.append(c)
+            elif indexed[c["id"]]["chunk_index"] != c["metadata"]["chunk_index"]:
+                to_renumber.append(c)  # same text, shifted position: metadata-only update
+        current = {c["id"] for c in source_chunks}
+        stale = [chunk_id for chunk_id in indexed if chunk_id not in current]
+        if stale:
+            to_delete[source] = stale
+
+    roots = [os.path.abspath(root) for root in roots]
+    for source, path in manifest.paths.items():
+        if source not in by_source and source in manifest.sources and under(path, roots):
+            to_delete[source] = list(manifest.chunks(source))
+    return to_embed, to_renumber, to_delete
+
+
+# ==============================
+# 🚚 Embed + upsert
+# ==============================
+def upsert_batch(client, index, batch, namespace):
+    response = client.embeddings.create(input=[c["text"] for c in batch], model=OPENAI_EMBED_MODEL)
+    index.upsert(
+        vectors=[
+            {"id": c["id"], "values": item.embedding, "metadata": c["metadata"]}
+            for c, item in zip(batch, response.data)
+        ],
+        namespace=namespace,
+    )
+    return batch
+
+
+def ingest(chunks, client, index, manifest, namespace=PINECONE_NAMESPACE, batch_size=100, workers=4, roots=(),
+           full=False):
+    to_embed, to_renumber, to_delete = plan_changes(chunks, manifest, roots, full)
+    manifest.set_paths({source_key(c): c["path"] for c in chunks})
+    deleting = sum(len(ids) for ids in to_delete.values())
+    unchanged = len(chunks) - len(to_embed) - len(to_renumber)
+    print(
+        f"{len(chunks)} chunks: {unchanged} unchanged, {len(to_embed)} to embed, "
+        f"{len(to_renumber)} to renumber, {deleting} to delete"
+    )
+
+    started, done = time.perf_counter(), 0
+    batches = [to_embed[i:i + batch_size] for i in range(0, len(to_embed), batch_size)]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(upsert_batch, client, index, batch, namespace) for batch in batches]
+        for future in as_completed(futures):
+            batch = future.result()
+            manifest.add(batch)
+            done += len(batch)
+            elapsed = time.perf_counter() - started
+            print(f"  {done}/{len(to_embed)} chunks upserted ({done / elapsed:.1f} chunks/s)")
+
+    for c in to_renumber:
+        index.update(id=c["id"], set_metadata={"chunk_index": c["metadata"]["chunk_index"]}, namespace=namespace)
+    if to_renumber:
+        manifest.add(to_renumber)
+
+    for source, ids in to_delete.items():
+        for start in range(0, len(ids), 1000):
+            index.delete(ids=ids[start:start + 1000], namespace=namespace)
+        manifest.remove(source, ids)
+
+    elapsed = time.perf_counter() - started
+    if done:
+        print(f"Embedded {done} chunks in {elapsed:.1f}s ({done / elapsed:.1f} chunks/s)")
+    return done
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="+", help="manual files or folders of manuals")
+    parser.add_argument("--kit", help="kit name for every manual (default: each manual's folder name)")
+    parser.add_argument("--namespace", default=PINECONE_NAMESPACE)
+    parser.add_argument("--chunk-tokens", type=int, default=300)
+    parser.add_argument("--overlap-tokens", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=100, help="chunks per embeddings call / upsert")
+    parser.add_argument("--workers", type=int, default=4, help="batches embedded and upserted in parallel")
+    parser.add_argument("--manifest", default=".ingest_manifest.json", help="chunk IDs and hashes per manual")
+    parser.add_argument("--full", action="store_true", help="re-embed everything (stale chunks are still deleted)")
+    args = parser.parse_args()
+
+    try:
+        chunks = [
+            chunk
+            for path in find_manuals(args.paths)
+            for chunk in manual_chunks(path, args.kit, args.chunk_tokens, args.overlap_tokens)
+        ]
+    except ImportError as e:
+        parser.exit(1, f"{e}\n")
+    ingest(
+        chunks,
+        OpenAI(api_key=OPENAI_API_KEY or None, max_retries=6),
+        Pinecone(api_key=PINECONE_API_KEY).Index(PINECONE_INDEX_NAME),
+        Manifest(args.manifest),
+        namespace=args.namespace,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        roots=args.paths,
+        full=args.full,
+    )
@@ -0,0 +1,82 @@
+# ==============================
+# 🧰 Kits
+# ==============================
+import re
+
+# Predefined kit list
+KNOWN_KITS = [
+    "Retail Kits: ",
+    "-------------",
+    "5in1 Robotics Kit",
+    "10in1 Robotics Kit",
+    "40in1 Robotics Kit",
+    "*********************"
+    "School Kits: ",
+    "-------------",
+    "Fun With Magnets",
+    "Components of food",
+    "Integers Positive and Negative",
+    "Separation of substances",
+    "Mensuration – Area perimeter",
+    "Motion and measurement of distance",
+    "India Natural Resources Minerals and Rocks",
+    "Journey of a water drop",
+    "Practical Geometry Constructions",
+    "Numbers Factors Multiples"
+]
+kit_list = "\n".join([f"- {kit}" for kit in KNOWN_KITS])
+
+# Phrases that identify a kit in a question, besides its full name. Matching is
+# case-insensitive on whole words. These must match the ``kit`` metadata that
+# ingest.py writes (the manual's folder name), i.e. the names in KNOWN_KITS.
+# A match switches a chat's sticky kit, so only phrases that cannot turn up in an
+# unrelated question belong here: "magnet", "motion", "rocks" or "factors" are
+# everyday words in robotics questions and would pull the chat into the wrong kit.
+KIT_ALIASES = {
+    "5in1 Robotics Kit": ["5in1", "5 in 1", "5-in-1", "five in one"],
+    "10in1 Robotics Kit": ["10in1", "10 in 1", "10-in-1", "ten in one"],
+    "40in1 Robotics Kit": ["40in1", "40 in 1", "40-in-1", "forty in one"],
+    "Fun With Magnets": [],
+    "Components of food": [],
+    "Integers Positive and Negative": ["positive and negative integers"],
+    "Separation of substances": [],
+    "Mensuration – Area perimeter": ["mensuration"],
+    "Motion and measurement of distance": ["measurement of distance"],
+    "India Natural Resources Minerals and Rocks": ["minerals and rocks"],
+    "Journey of a water drop": [],
+    "Practical Geometry Constructions": ["practical geometry"],
+    "Numbers Factors Multiples": ["factors and multiples"],
+}
+KIT_NAMES = list(KIT_ALIASES)
+
+_KIT_PATTERNS = [
+    (kit, re.compile(r"\b(?:" + "|".join(re.escape(a) for a in [kit.lower(), *aliases]) + r")\b"))
+    for kit, aliases in KIT_ALIASES.items()
+]
+
+
+def detect_kit(text):
+    """The single kit ``text`` talks about, or None if it names none (or several)."""
+    text = " ".join(text.lower().split())
+    found = {kit for kit, pattern in _KIT_PATTERNS if pattern.search(text)}
+    return found.pop() if len(found) == 1 else None
+
+
+def resolve_kit(user_query, chat_history, selected_kit=None):
+    """Kit scope for a question: the UI picker wins, then the question, then the newest user turn naming one."""
+    if selected_kit:
+        return selected_kit
+    kit = detect_kit(user_query)
+    if kit:
+        return kit
+    for msg in reversed(chat_history):
+        if msg.get("role") == "user":
+            kit = detect_kit(msg.get("content") or "")
+            if kit:
+                return kit
+    return None
+
+
+def kit_filter(kit):
+    """Metadata filter (Pinecone syntax) restricting retrieval to one kit's chunks."""
+    return {"kit": {"$eq": kit}} if kit else None
@@ -0,0 +1,212 @@
+"""Load test: many concurrent chat sessions against one process's pipeline.
+
+Each simulated session behaves like a browser tab on ``streamlit run app.py``:
+it has its own chat history, :class:`history.ConversationSummary` and
+:class:`session.SessionContext` (what the app keeps in ``st.session_state``),
+asks a question, reads the streamed answer, "thinks" for a while and asks the
+next one. Every session thread shares one pipeline and its caches, as all
+sessions of a Streamlit process share its ``st.cache_resource`` objects.
+
+Backends are the stand-ins from benchmark.py, with latencies set on the command
+line. Two limits model where requests queue:
+
+* ``--max-runs`` – answers computed at once (a bounded worker pool in front of
+  the pipeline; Streamlit itself has no such limit, which is the default)
+* ``--llm-concurrency`` – chat completions in flight at once (the OpenAI
+  account's rate/concurrency limit)
+
+For each session count it reports throughput, answer latency, time spent
+queueing for either limit, and memory growth per session (measured in a second
+pass with allocation tracing, so it doesn't slow the timed one)::
+
+    python -m butterfly_assistant.loadtest --sessions 10 50 100 200 --turns 5 --think-time 2 --llm-concurrency 50
+"""
+
+import argparse
+import functools
+import os
+import random
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+
+from .benchmark import (
+    CONFIGS,
+    FIXTURE_DIR,
+    HASHED_THRESHOLD,
+    RECORDING,
+    FakeChatCompletions,
+    RecordedEmbeddings,
+    build_pipeline,
+    build_store,
+    fake_client,
+    load_jsonl,
+)
+from .history import ConversationSummary
+from .session import SessionContext
+from .settings import OPENAI_CHAT_MODEL, SUMMARY_BATCH_TURNS, SUMMARY_KEEP_RECENT_TURNS
+
+_waits = threading.local()  # time this thread spent queueing for the LLM during the current answer
+
+
+class LimitedCompletions:
+    """Chat completions behind a semaphore, like a provider's concurrency limit; a stream holds its slot."""
+
+    def __init__(self, inner, limit):
+        self.inner = inner
+        self.slots = threading.BoundedSemaphore(limit) if limit else None
+
+    def create(self, **kwargs):
+        if self.slots is None:
+            return self.inner.create(**kwargs)
+        started = time.perf_counter()
+        self.slots.acquire()
+        _waits.llm = getattr(_waits, "llm", 0.0) + time.perf_counter() - started
+        try:
+            response = self.inner.create(**kwargs)
+        except Exception:
+            self.slots.release()
+            raise
+        if not kwargs.get("stream"):
+            self.slots.release()
+            return response
+        return self._release_after(response)
+
+    def _release_after(self, stream):
+        try:
+            yield from stream
+        finally:
+            self.slots.release()
+
+
+class SimulatedSession:
+    def __init__(self, pipeline, questions, turns, think_time, threshold, run_slots, seed):
+        self.pipeline = pipeline
+        self.rng = random.Random(seed)
+        self.questions = self.rng.sample(questions, min(turns, len(questions)))
+        self.think_time = think_time
+        self.threshold = threshold
+        self.run_slots = run_slots
+        # What app.py keeps in st.session_state
+        self.messages = []
+        self.summary = ConversationSummary()
+        self.context = SessionContext()
+        self.results = []  # (latency, run queue wait, llm wait) per answer
+        self.errors = 0
+
+    def run(self):
+        for question in self.questions:
+            time.sleep(self.rng.expovariate(1 / self.think_time) if self.think_time else 0)
+            issued = time.perf_counter()
+            _waits.llm = 0.0
+            if self.run_slots is not None:
+                self.run_slots.acquire()
+            queued = time.perf_counter() - issued
+            try:
+                self.ask(question["query"])
+            except Exception:
+                self.errors += 1
+                continue
+            finally:
+                if self.run_slots is not None:
+                    self.run_slots.release()
+            self.results.append((time.perf_counter() - issued, queued, _waits.llm))
+
+    def ask(self, query):
+        answer, *_ = self.pipeline.answer(
+            query, self.messages, threshold=self.threshold, stream=True, summary=self.summary, session=self.context
+        )
+        answer = "".join(answer)
+        self.messages.append({"role": "user", "content": query})
+        self.messages.append({"role": "assistant", "content": answer})
+        keep_recent = 2 * SUMMARY_KEEP_RECENT_TURNS
+        if self.summary.due(self.messages, keep_recent, 2 * SUMMARY_BATCH_TURNS):
+            self.summary.update_in_background(self.pipeline.client, OPENAI_CHAT_MODEL, self.messages, keep_recent)
+
+
+def run_sessions(n_sessions, pipeline, questions, args, threshold, think_time):
+    run_slots = threading.BoundedSemaphore(args.max_runs) if args.max_runs else None
+    sessions = [
+        SimulatedSession(pipeline, questions, args.turns, think_time, threshold, run_slots, seed=i)
+        for i in range(n_sessions)
+    ]
+    threads = [threading.Thread(target=s.run, daemon=True) for s in sessions]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sessions, time.perf_counter() - started
+
+
+def run_level(n_sessions, make_pipeline, questions, args, threshold):
+    sessions, wall = run_sessions(n_sessions, make_pipeline(), questions, args, threshold, args.think_time)
+
+    # Memory in a separate pass on a fresh pipeline (tracemalloc would distort the timings above);
+    # think time only stretches the run, it doesn't change what is allocated
+    pipeline = make_pipeline()
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    memory_sessions, _ = run_sessions(n_sessions, pipeline, questions, args, threshold, think_time=0)
+    current, _ = tracemalloc.get_traced_memory()  # sessions (and their state) are still referenced here
+    tracemalloc.stop()
+
+    results = np.array([r for s in sessions for r in s.results]) * 1000
+    if not len(results):
+        results = np.zeros((1, 3))
+    return {
+        "sessions": n_sessions,
+        "answers": sum(len(s.results) for s in sessions),
+        "errors": sum(s.errors for s in sessions),
+        "throughput_qps": sum(len(s.results) for s in sessions) / wall,
+        "p50_ms": float(np.percentile(results[:, 0], 50)),
+        "p95_ms": float(np.percentile(results[:, 0], 95)),
+        "queue_p95_ms": float(np.percentile(results[:, 1], 95)),
+        "llm_wait_p95_ms": float(np.percentile(results[:, 2], 95)),
+        "memory_per_session_kb": (current - baseline) / n_sessions / 1024,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, nargs="+", default=[10, 50, 100])
+    parser.add_argument("--turns", type=int, default=5, help="questions per session")
+    parser.add_argument("--think-time", type=float, default=2.0, help="mean seconds between a session's questions")
+    parser.add_argument("--max-runs", type=int, default=0, help="answers computed at once (0 = unlimited)")
+    parser.add_argument("--llm-concurrency", type=int, default=0, help="chat completions in flight (0 = unlimited)")
+    parser.add_argument("--config", choices=list(CONFIGS), default="full")
+    parser.add_argument("--embed-latency-ms", type=float, default=150.0)
+    parser.add_argument("--chat-latency-ms", type=float, default=500.0, help="time to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=60.0)
+    parser.add_argument("--answer-tokens", type=int, default=80)
+    args = parser.parse_args()
+
+    questions = load_jsonl(os.path.join(FIXTURE_DIR, "questions.jsonl"))
+    chunks = load_jsonl(os.path.join(FIXTURE_DIR, "chunks.jsonl"))
+    embeddings = RecordedEmbeddings(RECORDING, args.embed_latency_ms)
+    threshold = 0.5 if embeddings.vectors else HASHED_THRESHOLD
+    completions = LimitedCompletions(
+        FakeChatCompletions(args.chat_latency_ms, args.tokens_per_second, args.answer_tokens), args.llm_concurrency
+    )
+    client = fake_client(embeddings, completions)
+
+    print(f"{'sessions':>8} {'answers':>8} {'q/s':>7} {'p50':>9} {'p95':>9} {'queue p95':>10} {'llm wait p95':>13} "
+          f"{'KB/session':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        store_dir = build_store(chunks, embeddings, os.path.join(tmp, "store"))
+        # Load lazily-initialised globals (e.g. the tokenizer) before memory is measured
+        build_pipeline(CONFIGS[args.config], store_dir, fake_client(RecordedEmbeddings(RECORDING), completions)).answer(
+            questions[0]["query"], [], threshold=threshold
+        )
+        for n in args.sessions:
+            # Fresh caches per level (and per pass), so levels are comparable
+            make_pipeline = functools.partial(build_pipeline, CONFIGS[args.config], store_dir, client)
+            r = run_level(n, make_pipeline, questions, args, threshold)
+            print(
+                f"{r['sessions']:>8} {r['answers']:>8} {r['throughput_qps']:>7.2f} {r['p50_ms']:>7.0f}ms "
+                f"{r['p95_ms']:>7.0f}ms {r['queue_p95_ms']:>8.0f}ms {r['llm_wait_p95_ms']:>11.0f}ms "
+                f"{r['memory_per_session_kb']:>11.1f}" + (f"  ({r['errors']} errors)" if r["errors"] else "")
+            )
@@ -0,0 +1,88 @@
+"""Local, memory-mapped snapshot of a Pinecone namespace.
+
+The snapshot is a :mod:`chunk_store` directory (vectors, texts and metadata).
+Queries are a single matrix-vector product plus a partial sort, so small
+namespaces such as ``diy_kit_support_chunks`` can be searched without a
+network hop.
+
+Build or refresh a snapshot from Pinecone with::
+
+    PINECONE_API_KEY=... python -m butterfly_assistant.local_index sync \\
+        diy-kit-support diy_kit_support_chunks index_snapshot
+"""
+
+import os
+import sys
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from .chunk_store import ChunkStore, write_chunk_store
+
+
+@dataclass
+class Match:
+    id: str
+    score: float
+    metadata: dict = field(default_factory=dict)
+
+
+class LocalVectorIndex:
+    """Exact cosine top-k over a snapshot (see retrievers.NumpyRetriever for the query interface)."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.store = ChunkStore(directory)
+        self.namespace = self.store.namespace
+        self.ids = self.store.ids
+        self.vectors = self.store.vectors
+
+    @staticmethod
+    def exists(directory):
+        return ChunkStore.exists(directory)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, vector, top_k, rows=None):
+        """Return ``(rows, scores)`` of the ``top_k`` most similar chunks, best first.
+
+        ``rows`` optionally restricts the search to those row numbers (e.g. one kit's chunks).
+        """
+        candidates = self.vectors if rows is None else self.vectors[rows]
+        if not len(candidates):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        query = np.asarray(vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        scores = candidates @ query
+        top_k = min(top_k, len(scores))
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+        return (best if rows is None else np.asarray(rows)[best]), scores[best]
+
+
+def snapshot_from_pinecone(index, namespace, directory, batch_size=100):
+    """Copy every vector (and its metadata) of ``namespace`` into a local snapshot."""
+    ids, vectors, metadata = [], [], []
+    for page in index.list(namespace=namespace):
+        for start in range(0, len(page), batch_size):
+            fetched = index.fetch(ids=page[start:start + batch_size], namespace=namespace).vectors
+            for vector_id, record in fetched.items():
+                ids.append(vector_id)
+                vectors.append(record.values)
+                metadata.append(dict(record.metadata or {}))
+    write_chunk_store(directory, namespace, ids, vectors, metadata)
+    return len(ids)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 5 or sys.argv[1] != "sync":
+        sys.exit("usage: python -m butterfly_assistant.local_index sync <index-name> <namespace> <directory>")
+
+    from pinecone import Pinecone
+
+    _, _, index_name, namespace, directory = sys.argv
+    count = snapshot_from_pinecone(
+        Pinecone(api_key=os.environ["PINECONE_API_KEY"]).Index(index_name), namespace, directory
+    )
+    print(f"Wrote {count} vectors from {index_name}/{namespace} to {directory}")
@@ -0,0 +1,282 @@
+"""Prometheus metrics for the assistant, without a client-library dependency.
+
+Counters and histograms live in a :class:`Registry` and are rendered in the
+Prometheus text exposition format. The registry can be scraped from a sidecar
+HTTP endpoint (``METRICS_PORT``, served at ``/metrics``) or written periodically
+to a file for node_exporter's textfile collector (``METRICS_TEXTFILE_PATH``).
+
+Stage and end-to-end latencies come from finished telemetry traces via
+:class:`MetricsExporter`; the pipeline counts queries, fallbacks, answer-cache
+hits, tokens and errors directly, and cache-wide statistics are read at scrape
+time by :func:`bind_cache_metrics`.
+"""
+
+import functools
+import inspect
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children = {}
+
+    def labels(self, *values):
+        values = tuple(str(v) for v in values)
+        with self._lock:
+            if values not in self._children:
+                self._children[values] = self._new_child()
+            return self._children[values]
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            children = list(self._children.items())
+        for values, child in sorted(children):
+            lines.extend(self._sample_lines(values, child))
+        return lines
+
+
+class _CounterChild:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def _sample_lines(self, values, child):
+        return [f"{self.name}{_labels(self.labelnames, values)} {child.value:g}"]
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        with self._lock:
+            self.sum += value
+            self.count += 1
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+                    break
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def _sample_lines(self, values, child):
+        with child._lock:
+            counts, total, count = list(child.counts), child.sum, child.count
+        lines, cumulative = [], 0
+        for bound, n in zip(self.buckets, counts):
+            cumulative += n
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, values, [('le', f'{bound:g}')])} {cumulative}")
+        lines.append(f"{self.name}_bucket{_labels(self.labelnames, values, [('le', '+Inf')])} {count}")
+        lines.append(f"{self.name}_sum{_labels(self.labelnames, values)} {total:g}")
+        lines.append(f"{self.name}_count{_labels(self.labelnames, values)} {count}")
+        return lines
+
+
+class CallbackCounter:
+    """A counter whose per-label values are read from ``fn() -> {label_values: value}`` at scrape time."""
+
+    def __init__(self, name, documentation, labelnames, fn):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.fn = fn
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for values, value in sorted(self.fn().items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, values)} {value:g}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def register(self, metric):
+        with self._lock:
+            # Re-registering by name replaces the metric (e.g. a new cache after a Streamlit cache clear)
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def exposition(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(line for metric in metrics for line in metric.collect()) + "\n"
+
+
+REGISTRY = Registry()
+
+# ==============================
+# 📈 Assistant metrics
+# ==============================
+REQUEST_SECONDS = REGISTRY.histogram("assistant_request_seconds", "End-to-end latency of a chat turn.")
+STAGE_SECONDS = REGISTRY.histogram("assistant_stage_seconds", "Latency of one pipeline stage.", ["stage"])
+QUERIES = REGISTRY.counter("assistant_queries_total", "Questions answered.", ["kit"])
+FALLBACKS = REGISTRY.counter(
+    "assistant_fallbacks_total", "Questions whose best_score was below the confidence threshold.", ["kit"]
+)
+ANSWER_CACHE_LOOKUPS = REGISTRY.counter(
+    "assistant_answer_cache_lookups_total", "Semantic answer cache lookups.", ["result"]
+)
+TOKENS = REGISTRY.counter("assistant_tokens_total", "Chat model tokens, prompt (in) and completion (out).", ["kind"])
+ERRORS = REGISTRY.counter("assistant_errors_total", "Failed answers, by exception type.", ["error"])
+
+
+def count_errors(func):
+    """Count exceptions escaping ``func`` (sync or async) in ``assistant_errors_total``."""
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            try:
+                return await func(*args, **kwargs)
+            except Exception as e:
+                ERRORS.labels(type(e).__name__).inc()
+                raise
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            ERRORS.labels(type(e).__name__).inc()
+            raise
+    return wrapper
+
+
+def bind_cache_metrics(embedding_cache, registry=REGISTRY):
+    """Expose the embedding cache's own hit/miss counts (memory, SQLite, misses)."""
+    def values():
+        stats = embedding_cache.stats()
+        return {("memory",): stats["hits"], ("disk",): stats["disk_hits"], ("miss",): stats["misses"]}
+    registry.register(CallbackCounter(
+        "assistant_embedding_cache_lookups_total", "Query embedding cache lookups.", ["result"], values
+    ))
+
+
+class MetricsExporter:
+    """Trace exporter (see telemetry.py) feeding request and stage latencies into the histograms."""
+
+    def export(self, trace):
+        REQUEST_SECONDS.observe(trace.root.duration_ms / 1000)
+        for span in trace.spans[1:]:
+            if span.duration_ms is not None:
+                STAGE_SECONDS.labels(span.name).observe(span.duration_ms / 1000)
+
+
+# ==============================
+# 🌐 Exposition
+# ==============================
+def start_http_server(port, registry=REGISTRY, host="0.0.0.0"):
+    """Serve ``/metrics`` from a daemon thread; returns the server (``server.shutdown()`` stops it)."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.exposition().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):  # keep scrapes out of the app log
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics-http").start()
+    return server
+
+
+def start_worker_http_server(base_port, max_workers=64, registry=REGISTRY, host="0.0.0.0"):
+    """``/metrics`` for one process of a multi-worker server, on the first free port from ``base_port``.
+
+    Every worker has its own registry, so a single shared endpoint would report a
+    random worker per scrape. Instead N workers listen on ``base_port`` …
+    ``base_port + N - 1`` and Prometheus scrapes each as its own target.
+    """
+    for port in range(base_port, base_port + max_workers):
+        try:
+            return start_http_server(port, registry, host)
+        except OSError:  # taken by a sibling worker
+            continue
+    raise OSError(f"No free metrics port in {base_port}-{base_port + max_workers - 1}")
+
+
+def write_textfile(path, registry=REGISTRY):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(registry.exposition())
+    os.replace(tmp, path)  # the collector never reads a half-written file
+
+
+def start_textfile_writer(path, interval=15.0, registry=REGISTRY):
+    def loop():
+        while True:
+            try:
+                write_textfile(path, registry)
+            except OSError as e:
+                print(f"Writing metrics to {path} failed: {e}")
+            time.sleep(interval)
+    thread = threading.Thread(target=loop, daemon=True, name="metrics-textfile")
+    thread.start()
+    return thread
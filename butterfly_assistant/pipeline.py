@@ -0,0 +1,551 @@
+import asyncio
+import threading
+
+from openai import AsyncOpenAI, OpenAI
+from pinecone import Pinecone
+
+from .answer_cache import SemanticAnswerCache
+from .bm25 import LexicalIndex, reciprocal_rank_fusion
+from .chunk_store import ChunkStore
+from .compress import ContextCompressor
+from .embedding_cache import EmbeddingCache
+from .history import count_prompt_tokens, count_text_tokens, trim_history
+from .kits import kit_filter, kit_list, resolve_kit
+from .metrics import ANSWER_CACHE_LOOKUPS, FALLBACKS, QUERIES, TOKENS, count_errors
+from .rerank import make_reranker
+from .telemetry import Trace
+from .tuning import QueryLog, Tuning
+from .retrievers import make_retriever
+from .settings import (
+    ANSWER_CACHE_MAX_DISTANCE,
+    ANSWER_CACHE_MAX_ENTRIES,
+    ANSWER_CACHE_TTL_SECONDS,
+    CONTEXT_COMPRESSION,
+    EMBED_CACHE_PATH,
+    EMBED_CACHE_SIZE,
+    FALLBACK_FAST_PATH,
+    HISTORY_TOKEN_BUDGET,
+    HYBRID_RETRIEVAL,
+    LEXICAL_SKIP_EMBEDDING,
+    LOCAL_INDEX_DIR,
+    OPENAI_API_KEY,
+    OPENAI_CHAT_MODEL,
+    OPENAI_EMBED_MODEL,
+    PINECONE_API_KEY,
+    PINECONE_INDEX_NAME,
+    PINECONE_NAMESPACE,
+    QUERY_LOG_PATH,
+    RERANK_CANDIDATES,
+    RERANK_ENABLED,
+    RERANK_KEEP,
+    RERANK_MODEL,
+    RETRIEVER_BACKEND,
+    TUNING_PATH,
+)
+
+# ==============================
+# 🧑‍🏫 Mentor-style instruction
+# ==============================
+MENTOR_STYLE_INSTRUCTION = (
+    "You are a friendly mentor helping kids and parents with Butterfly Fields DIY kits. "
+    "Always explain things in a clear, step-by-step way, simple enough for a child but also helpful for parents. "
+    "Keep your tone encouraging and supportive, like a teacher guiding a curious student. "
+    "Give answers in short, bite-sized pieces (2–4 sentences max). "
+    "Whenever possible, use simple bullets (•) or numbered steps (1, 2, 3). "
+    "If the instruction manuals provide the answer, use only them to give your answer. "
+    "Otherwise, say you don't know. "
+)
+
+# Shown when retrieval finds nothing good enough; static, so it is built once
+FALLBACK_RESPONSE = (
+    f"🤔 Sorry, I don’t see that in the Butterfly Fields manuals. 🦋  \n"
+    "Could you tell me which kit or activity you mean?  \n"
+    "\nHere are some kits I can answer about:\n"
+    f"{kit_list}"
+)
+
+# ==============================
+# ✍️ Prompt
+# ==============================
+def build_prompt(user_query, chat_history, best_score, context_texts, threshold, summary_text=""):
+    llm_prompt = []
+
+    # 3.1 : Add system instruction to LLM prompt - ROLE: SYSTEM
+    llm_prompt.append({"role": "system", "content": MENTOR_STYLE_INSTRUCTION})
+
+    # 3.1b: Older turns, compacted into a running summary - LONG-TERM MEMORY
+    if summary_text:
+        llm_prompt.append({"role": "system", "content": f"Summary of the earlier conversation:\n{summary_text}"})
+
+    # 3.2 : Add fallback response
+    fallback_response = FALLBACK_RESPONSE
+
+    # 3.2 : Add chat history to LLM prompt - MEMORY
+    for msg in chat_history:
+        llm_prompt.append(msg)
+
+    # 3.3: Add retrieved docs to LLM prompt - KNOWLEDGE BASE
+    if best_score >= threshold:
+      context_block = "\n\n".join(context_texts)
+      context = f"Relevant context from instruction manuals:\n{context_block}"
+      llm_prompt.append({"role": "user", "content": context})
+    else:
+      context = fallback_response  # empty -> fallback response
+      llm_prompt.append({"role": "assistant", "content": context})
+
+    # 3.4: Add user query to LLM prompt
+    llm_prompt.append({"role": "user", "content": user_query})
+
+    return llm_prompt, fallback_response
+
+# ==============================
+# 🌊 Streaming helpers
+# ==============================
+def stream_tokens(response, on_complete=None):
+    """Yield content deltas from a streamed chat completion, then hand the full text to ``on_complete``."""
+    parts = []
+    for chunk in response:
+        if chunk.choices and chunk.choices[0].delta.content:
+            parts.append(chunk.choices[0].delta.content)
+            yield chunk.choices[0].delta.content
+    if on_complete is not None:
+        on_complete("".join(parts))
+
+async def astream_tokens(response, on_complete=None):
+    """Async twin of :func:`stream_tokens` for ``AsyncOpenAI`` streams (``on_complete`` runs in a thread)."""
+    parts = []
+    async for chunk in response:
+        if chunk.choices and chunk.choices[0].delta.content:
+            parts.append(chunk.choices[0].delta.content)
+            yield chunk.choices[0].delta.content
+    if on_complete is not None:
+        await asyncio.to_thread(on_complete, "".join(parts))
+
+async def _aiter(items):
+    for item in items:
+        yield item
+
+def merge_matches(match_lists, top_k):
+    """Union of several result lists, keeping each chunk's best score."""
+    best = {}
+    for matches in match_lists:
+        for m in matches:
+            if m.id not in best or m.score > best[m.id].score:
+                best[m.id] = m
+    return sorted(best.values(), key=lambda m: m.score, reverse=True)[:top_k]
+
+# ==============================
+# ⚡ Fallback fast path
+# ==============================
+class FastPathStats:
+    """How many answers the fallback fast path served without calling the LLM (shared across sessions)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.taken = 0
+        self.queries = 0
+
+    def record(self, taken):
+        with self._lock:
+            self.queries += 1
+            self.taken += taken
+
+    def stats(self):
+        return {
+            "taken": self.taken,
+            "queries": self.queries,
+            "rate": self.taken / self.queries if self.queries else 0.0,
+        }
+
+# ==============================
+# 🔎 RAG Pipeline
+# ==============================
+class RagPipeline:
+    """Embed → retrieve → generate, shared by the Streamlit app and any other caller.
+
+    ``answer`` is the blocking path used on the Streamlit script thread.
+    ``answer_async`` does the same work on an event loop with ``AsyncOpenAI`` and
+    the retriever's ``aquery``, so one process can serve many sessions and
+    independent steps (e.g. retrieval for several query variants) run concurrently.
+    """
+
+    def __init__(self, client, retriever, embedding_cache, answer_cache, async_client=None,
+                 namespace=PINECONE_NAMESPACE, embed_model=OPENAI_EMBED_MODEL, chat_model=OPENAI_CHAT_MODEL,
+                 history_token_budget=HISTORY_TOKEN_BUDGET, lexical_index=None, lexical_skip=LEXICAL_SKIP_EMBEDDING,
+                 reranker=None, rerank_candidates=RERANK_CANDIDATES, rerank_keep=RERANK_KEEP, compressor=None,
+                 fallback_fast_path=FALLBACK_FAST_PATH, fast_path_stats=None, tuning=None, query_log=None,
+                 kits_without_chunks=None):
+        self.client = client
+        self.async_client = async_client
+        self.retriever = retriever
+        self.embedding_cache = embedding_cache
+        self.answer_cache = answer_cache
+        self.namespace = namespace
+        self.embed_model = embed_model
+        self.chat_model = chat_model
+        self.history_token_budget = history_token_budget
+        self.lexical_index = lexical_index
+        self.lexical_skip = lexical_skip
+        self.reranker = reranker
+        self.rerank_keep = rerank_keep
+        # With a reranker, retrieve a wider candidate set and let it pick the few that reach the prompt
+        self.top_k = rerank_candidates if reranker is not None else 5
+        self.compressor = compressor
+        self.fallback_fast_path = fallback_fast_path
+        self.fast_path_stats = fast_path_stats if fast_path_stats is not None else FastPathStats()
+        self.tuning = tuning or Tuning()  # per-kit threshold / chunk count overrides (tuning.py)
+        self.query_log = query_log
+        # Kits whose metadata filter matched nothing in this index; pass a shared set when the
+        # pipeline is rebuilt per request (as app.py does on every rerun) so it outlives the pipeline
+        self._kits_without_chunks = kits_without_chunks if kits_without_chunks is not None else set()
+
+    # --- Embeddings ---
+    def embed(self, text):
+        return self.embedding_cache.get_or_create(
+            text,
+            self.embed_model,
+            lambda: self.client.embeddings.create(input=text, model=self.embed_model).data[0].embedding,
+        )
+
+    async def aembed_many(self, texts):
+        """Embed several texts with at most one (batched) API call for the cache misses."""
+        # Cache reads and writes may hit SQLite, so they run off the event loop
+        vectors = await asyncio.to_thread(lambda: [self.embedding_cache.get(t, self.embed_model) for t in texts])
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            response = await self.async_client.embeddings.create(
+                input=[texts[i] for i in missing], model=self.embed_model
+            )
+            for i, item in zip(missing, response.data):
+                vectors[i] = item.embedding
+            await asyncio.to_thread(
+                lambda: [self.embedding_cache.put(texts[i], self.embed_model, vectors[i]) for i in missing]
+            )
+        return vectors
+
+    # --- Shared between the sync and async paths ---
+    def _resolve_kit(self, user_query, chat_history, selected_kit, session):
+        if session is not None:
+            return session.resolve_kit(user_query, selected_kit)  # sticky: no history re-scan
+        return resolve_kit(user_query, chat_history, selected_kit)
+
+    def _kit_filter(self, kit):
+        return kit_filter(kit) if kit not in self._kits_without_chunks else None
+
+    def _dense(self, embedding, kit):
+        matches = self.retriever.query(
+            embedding, top_k=self.top_k, namespace=self.namespace, filter=self._kit_filter(kit)
+        )
+        if kit and not matches and kit not in self._kits_without_chunks:
+            matches = self._unfiltered(kit, self.retriever.query(embedding, top_k=self.top_k, namespace=self.namespace))
+        return matches
+
+    async def _adense(self, embedding, kit):
+        matches = await self.retriever.aquery(
+            embedding, top_k=self.top_k, namespace=self.namespace, filter=self._kit_filter(kit)
+        )
+        if kit and not matches and kit not in self._kits_without_chunks:
+            matches = self._unfiltered(
+                kit, await self.retriever.aquery(embedding, top_k=self.top_k, namespace=self.namespace)
+            )
+        return matches
+
+    def _unfiltered(self, kit, matches):
+        # A kit filter returns the nearest chunks regardless of score, so an empty result means no chunk
+        # carries this kit (e.g. an index built before kit metadata). Skip the filter for it from now on
+        # instead of paying a second round trip on every turn; restart after re-ingesting with metadata.
+        if matches:
+            self._kits_without_chunks.add(kit)
+        return matches
+
+    def _lexical(self, user_query, kit):
+        """BM25 ``(row, score)`` hits for the query, scoped to ``kit`` like the vector search."""
+        if self.lexical_index is None:
+            return []
+        rows = self.lexical_index.store.rows_where("kit", kit) if kit else None
+        results = self.lexical_index.search(user_query, top_k=self.top_k, rows=rows)
+        if kit and not results:
+            results = self.lexical_index.search(user_query, top_k=self.top_k)
+        return results
+
+    def _lexical_stage(self, user_query, kit):
+        lexical = self._lexical(user_query, kit)
+        return lexical, self._lexical_only(user_query, lexical)
+
+    def _lexical_only(self, user_query, lexical):
+        """Matches and best_score when the lexical hit alone is trustworthy enough to skip embedding."""
+        if lexical and self.lexical_skip and self.lexical_index.confident(user_query, lexical):
+            return self.lexical_index.matches(lexical), self.lexical_index.coverage(user_query, lexical[0][0])
+        return None
+
+    def _fuse(self, dense, lexical):
+        if not lexical:
+            return dense, "dense"
+        return reciprocal_rank_fusion([dense, self.lexical_index.matches(lexical)], top_k=self.top_k), "hybrid"
+
+    def _rerank(self, user_query, candidates, kit):
+        if self.reranker is None:
+            return candidates[:self.tuning.top_k(kit, len(candidates))]
+        return self.reranker.rerank(user_query, candidates, self.tuning.top_k(kit, self.rerank_keep))
+
+    def _log(self, user_query, info, best_score, scores, matches):
+        """Record the query's score distribution for offline tuning; returns its ID for labelling."""
+        if self.query_log is None:
+            return None
+        return self.query_log.log_query(
+            query=user_query,
+            kit=info["kit"],
+            retrieval=info["retrieval"],
+            best_score=best_score,
+            scores=scores,
+            threshold=info["threshold"],
+            chunk_ids=[m.id for m in matches],
+            fast_path=info["fast_path"],
+        )
+
+    def _prepare(self, user_query, chat_history, threshold, max_history_turns, summary, embedding, matches,
+                 best_score):
+        context_texts = [m.metadata.get("text_content", "") for m in matches]
+        chunk_ids = [m.id for m in matches]
+        context_tokens = sum(count_text_tokens(t, self.chat_model) for t in context_texts)
+        if self.compressor is not None and best_score >= threshold:
+            context_texts = self.compressor.compress(user_query, context_texts)
+
+        # Messages already folded into the summary are replaced by it
+        summary_text, summarised = summary.snapshot() if summary is not None else ("", 0)
+        recent = chat_history[summarised:]
+        history = trim_history(recent, max_history_turns, self.history_token_budget, self.chat_model)
+        llm_prompt, fallback_response = build_prompt(
+            user_query, history, best_score, context_texts, threshold, summary_text
+        )
+        info = {
+            "prompt_tokens": count_prompt_tokens(llm_prompt, self.chat_model),
+            "history_messages": len(history),
+            "history_messages_dropped": len(recent) - len(history),
+            "summarised_messages": summarised,
+            "context_tokens_raw": context_tokens,
+            "context_tokens": sum(count_text_tokens(t, self.chat_model) for t in context_texts),
+        }
+
+        # Nothing relevant retrieved: answer with the canned fallback instead of having the LLM paraphrase it
+        fast_path = self.fallback_fast_path and best_score < threshold
+        self.fast_path_stats.record(fast_path)
+        if fast_path:
+            info.update(prompt_tokens=0, fast_path=True)
+            return llm_prompt, best_score, context_texts, fallback_response, info, fallback_response, lambda text: None
+        info["fast_path"] = False
+
+        # Reuse the answer to a near-identical first question; answers that depend on history are never shared.
+        # A lexical-only retrieval has no embedding, so it is keyed on the normalized question instead.
+        use_answer_cache = not chat_history
+        cached_answer = None
+        if use_answer_cache:
+            if embedding is not None:
+                cached_answer = self.answer_cache.lookup(embedding, chunk_ids)
+            else:
+                cached_answer = self.answer_cache.lookup_text(user_query, chunk_ids)
+            ANSWER_CACHE_LOOKUPS.labels("hit" if cached_answer is not None else "miss").inc()
+
+        def remember(text):
+            if not use_answer_cache:
+                return
+            if embedding is not None:
+                self.answer_cache.store(embedding, chunk_ids, text)
+            else:
+                self.answer_cache.store_text(user_query, chunk_ids, text)
+
+        return llm_prompt, best_score, context_texts, fallback_response, info, cached_answer, remember
+
+    def _count(self, info, best_score):
+        kit = info["kit"] or ""
+        QUERIES.labels(kit).inc()
+        if best_score < info["threshold"]:
+            FALLBACKS.labels(kit).inc()
+
+    def _on_generated(self, span, remember, prompt_tokens):
+        """Completion callback: ends the generate span (with the stream, when streaming) and counts tokens."""
+        TOKENS.labels("prompt").inc(prompt_tokens)  # cache hits and the fast path send no prompt
+
+        def on_complete(text):
+            span.end()
+            TOKENS.labels("completion").inc(count_text_tokens(text, self.chat_model))
+            remember(text)
+        return on_complete
+
+    def _retrieved(self, dense, lexical):
+        """best_score, dense scores, fused candidates and retrieval mode for a vector search result."""
+        best_score = dense[0].score if dense else 0
+        matches, retrieval = self._fuse(dense, lexical)
+        return best_score, [m.score for m in dense], matches, retrieval
+
+    def _select(self, user_query, kit, session, embedding, matches):
+        """Rerank candidates down to the chunks that reach the prompt and remember them for the session."""
+        matches = self._rerank(user_query, matches, kit)
+        if session is not None:
+            session.remember(user_query, embedding, [m.id for m in matches])
+        return matches
+
+    def _build(self, user_query, chat_history, threshold, max_history_turns, summary, trace, kit, retrieval,
+               candidates, embedding, matches, best_score, scores):
+        """Prompt, cached answer (if any), completion callback and the ``(best_score, context_texts,
+        fallback_response, info)`` part of the result."""
+        with trace.span("prompt-build"):
+            llm_prompt, best_score, context_texts, fallback_response, info, cached_answer, remember = self._prepare(
+                user_query, chat_history, threshold, max_history_turns, summary, embedding, matches, best_score
+            )
+        info.update(kit=kit, retrieval=retrieval, candidates=candidates, kept=len(matches), threshold=threshold)
+        info["query_id"] = self._log(user_query, info, best_score, scores, matches)
+        info["trace_id"] = trace.trace_id
+        self._count(info, best_score)
+        return llm_prompt, cached_answer, remember, (best_score, context_texts, fallback_response, info)
+
+    def _completion_args(self, llm_prompt, stream):
+        return {"model": self.chat_model, "messages": llm_prompt, "temperature": 0.2, "stream": stream}
+
+    # --- Blocking path ---
+    @count_errors
+    def answer(self, user_query, chat_history, threshold=0.5, max_history_turns=10, stream=False, summary=None,
+               kit=None, session=None, trace=None):
+        # With stream=True the answer is a generator of text chunks (for st.write_stream);
+        # best_score / context_texts / fallback_response / info are available immediately.
+        # chat_history is trimmed to the newest max_history_turns that fit the token budget;
+        # info reports the resulting prompt size. A history.ConversationSummary passed as
+        # ``summary`` stands in for the messages it already covers. Retrieval is limited to one
+        # kit's chunks: ``kit`` (e.g. from a UI picker) or the kit named in the question/history.
+        # A session.SessionContext passed as ``session`` keeps that kit sticky across turns.
+        # Stage timings are recorded as spans on ``trace`` (telemetry.Trace), if given.
+        trace = trace or Trace()
+
+        # --- Step 2: Retrieve relevant context ---
+        kit = self._resolve_kit(user_query, chat_history, kit, session)
+        threshold = self.tuning.threshold(kit, threshold)
+        with trace.span("lexical"):
+            lexical, lexical_only = self._lexical_stage(user_query, kit)
+        if lexical_only:
+            # An exact part-name hit: no embedding round trip, no vector search
+            embedding, retrieval, scores = None, "lexical", []
+            matches, best_score = lexical_only
+        else:
+            with trace.span("embed"):
+                embedding = (session.embedding(user_query) if session is not None else None) or self.embed(user_query)
+            with trace.span("retrieve"):
+                best_score, scores, matches, retrieval = self._retrieved(self._dense(embedding, kit), lexical)
+        candidates = len(matches)
+        with trace.span("rerank"):
+            matches = self._select(user_query, kit, session, embedding, matches)
+
+        # --- Step 3: Build messages ---
+        llm_prompt, cached_answer, remember, result = self._build(
+            user_query, chat_history, threshold, max_history_turns, summary, trace, kit, retrieval, candidates,
+            embedding, matches, best_score, scores,
+        )
+
+        # --- Step 4: Generate answer ---
+        if cached_answer is not None:  # answer cache hit or fallback fast path
+            return (iter([cached_answer]) if stream else cached_answer), *result
+
+        generate = trace.start("generate", model=self.chat_model, stream=stream)
+        response = self.client.chat.completions.create(**self._completion_args(llm_prompt, stream))
+        on_complete = self._on_generated(generate, remember, result[-1]["prompt_tokens"])
+        if stream:
+            return stream_tokens(response, on_complete), *result
+
+        answer = response.choices[0].message.content
+        on_complete(answer)
+        return answer, *result
+
+    # --- Async path ---
+    @count_errors
+    async def answer_async(self, user_query, chat_history, threshold=0.5, max_history_turns=10, stream=False,
+                           summary=None, kit=None, session=None, query_variants=(), trace=None):
+        # query_variants (e.g. rewrites of the question) are embedded in the same API call and
+        # retrieved concurrently; their results are merged by best score per chunk. CPU- and
+        # disk-bound steps (BM25, reranking, token counting, compression, cache and log writes)
+        # run in worker threads so one request never stalls the others on the event loop.
+        trace = trace or Trace()
+
+        # --- Step 2: Retrieve relevant context ---
+        kit = self._resolve_kit(user_query, chat_history, kit, session)
+        threshold = self.tuning.threshold(kit, threshold)
+        with trace.span("lexical"):
+            lexical, lexical_only = await asyncio.to_thread(self._lexical_stage, user_query, kit)
+        if lexical_only:
+            embedding, retrieval, scores = None, "lexical", []
+            matches, best_score = lexical_only
+        else:
+            with trace.span("embed"):
+                embeddings = await self.aembed_many([user_query, *query_variants])
+            with trace.span("retrieve"):
+                match_lists = await asyncio.gather(*(self._adense(e, kit) for e in embeddings))
+                embedding, dense = embeddings[0], merge_matches(match_lists, top_k=self.top_k)
+                best_score, scores, matches, retrieval = self._retrieved(dense, lexical)
+        candidates = len(matches)
+        with trace.span("rerank"):
+            matches = await asyncio.to_thread(self._select, user_query, kit, session, embedding, matches)
+
+        # --- Step 3: Build messages ---
+        llm_prompt, cached_answer, remember, result = await asyncio.to_thread(
+            self._build,
+            user_query, chat_history, threshold, max_history_turns, summary, trace, kit, retrieval, candidates,
+            embedding, matches, best_score, scores,
+        )
+
+        # --- Step 4: Generate answer ---
+        if cached_answer is not None:  # answer cache hit or fallback fast path
+            return (_aiter([cached_answer]) if stream else cached_answer), *result
+
+        generate = trace.start("generate", model=self.chat_model, stream=stream)
+        response = await self.async_client.chat.completions.create(**self._completion_args(llm_prompt, stream))
+        on_complete = self._on_generated(generate, remember, result[-1]["prompt_tokens"])
+        if stream:
+            return astream_tokens(response, on_complete), *result
+
+        answer = response.choices[0].message.content
+        await asyncio.to_thread(on_complete, answer)
+        return answer, *result
+
+    def summarise_in_background(self, summary, chat_history, keep_recent_messages):
+        """Fold turns that aged out of the recent window into ``summary``, off the critical path."""
+        summary.update_in_background(self.client, self.chat_model, chat_history, keep_recent_messages)
+
+
+def create_pipeline(client=None, async_client=None):
+    """Build a pipeline from settings.py for use outside Streamlit (batch jobs, servers)."""
+    return RagPipeline(
+        client or OpenAI(api_key=OPENAI_API_KEY or None),
+        make_retriever(
+            RETRIEVER_BACKEND,
+            LOCAL_INDEX_DIR,
+            PINECONE_NAMESPACE,
+            pinecone_index=lambda: Pinecone(api_key=PINECONE_API_KEY).Index(PINECONE_INDEX_NAME),
+        ),
+        EmbeddingCache(maxsize=EMBED_CACHE_SIZE, path=EMBED_CACHE_PATH or None),
+        SemanticAnswerCache(
+            max_distance=ANSWER_CACHE_MAX_DISTANCE,
+            ttl_seconds=ANSWER_CACHE_TTL_SECONDS,
+            max_entries=ANSWER_CACHE_MAX_ENTRIES,
+        ),
+        async_client=async_client or AsyncOpenAI(api_key=OPENAI_API_KEY or None),
+        lexical_index=create_lexical_index(),
+        reranker=make_reranker(RERANK_MODEL) if RERANK_ENABLED else None,
+        compressor=create_compressor(),
+        tuning=Tuning.load(TUNING_PATH),
+        query_log=QueryLog(QUERY_LOG_PATH) if QUERY_LOG_PATH else None,
+    )
+
+
+def create_lexical_index():
+    """BM25 over the local chunk store, or None when hybrid retrieval is off or there is no snapshot."""
+    if not HYBRID_RETRIEVAL or not ChunkStore.exists(LOCAL_INDEX_DIR):
+        return None
+    store = ChunkStore(LOCAL_INDEX_DIR)
+    return LexicalIndex(store) if store.namespace == PINECONE_NAMESPACE else None
+
+
+def create_compressor():
+    """Context compressor, with boilerplate learned from the local chunk store when there is one."""
+    if not CONTEXT_COMPRESSION:
+        return None
+    if ChunkStore.exists(LOCAL_INDEX_DIR):
+        return ContextCompressor.from_store(ChunkStore(LOCAL_INDEX_DIR))
+    return ContextCompressor()
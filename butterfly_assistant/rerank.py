@@ -0,0 +1,83 @@
+"""Local reranking of retrieved candidates, so only the best few reach the prompt.
+
+Retrieval fetches a wider candidate set (``RERANK_CANDIDATES``); a reranker
+re-scores those against the question on the CPU and the pipeline keeps the top
+``RERANK_KEEP``. Fewer, more relevant chunks mean a shorter prompt and a faster,
+cheaper completion.
+
+The default :class:`LexicalReranker` needs nothing beyond the standard library.
+If ``RERANK_MODEL`` names a cross-encoder and ``sentence-transformers`` is
+installed, :class:`CrossEncoderReranker` is used instead.
+"""
+
+import math
+
+from .bm25 import tokenize
+
+try:
+    from sentence_transformers import CrossEncoder
+except ImportError:  # optional; the lexical reranker covers the default install
+    CrossEncoder = None
+
+
+def _text(match):
+    return match.metadata.get("text_content", "")
+
+
+class LexicalReranker:
+    """Query-term overlap (IDF-weighted within the candidate set) plus adjacent-term
+    phrase matches, blended with the retrieval rank so ties keep the retriever's order."""
+
+    def __init__(self, rank_weight=0.3, phrase_weight=0.5):
+        self.rank_weight = rank_weight
+        self.phrase_weight = phrase_weight
+
+    def scores(self, query, matches):
+        terms = list(dict.fromkeys(tokenize(query)))
+        docs = [tokenize(_text(m)) for m in matches]
+        if not terms or not matches:
+            return [0.0] * len(matches)
+
+        doc_terms = [set(d) for d in docs]
+        n = len(matches)
+        idf = {t: math.log(1 + (n + 0.5) / (sum(t in d for d in doc_terms) + 0.5)) for t in terms}
+        total = sum(idf.values())
+        phrases = set(zip(terms, terms[1:]))
+
+        scores = []
+        for rank, (tokens, found) in enumerate(zip(docs, doc_terms)):
+            overlap = sum(idf[t] for t in terms if t in found) / total
+            phrase = len(phrases & set(zip(tokens, tokens[1:]))) / len(phrases) if phrases else 0.0
+            prior = 1 - rank / n
+            lexical = (overlap + self.phrase_weight * phrase) / (1 + self.phrase_weight)
+            scores.append((1 - self.rank_weight) * lexical + self.rank_weight * prior)
+        return scores
+
+    def rerank(self, query, matches, keep):
+        scores = self.scores(query, matches)
+        order = sorted(range(len(matches)), key=lambda i: scores[i], reverse=True)
+        return [matches[i] for i in order[:keep]]
+
+
+class CrossEncoderReranker(LexicalReranker):
+    """A sentence-transformers cross-encoder (e.g. ``cross-encoder/ms-marco-MiniLM-L-6-v2``) on the CPU."""
+
+    def __init__(self, model_name):
+        super().__init__()
+        self.model = CrossEncoder(model_name, device="cpu")
+
+    def scores(self, query, matches):
+        if not matches:
+            return []
+        return [float(s) for s in self.model.predict([(query, _text(m)) for m in matches])]
+
+
+def make_reranker(model_name=""):
+    if model_name and CrossEncoder is not None:
+        try:
+            return CrossEncoderReranker(model_name)
+        except Exception as e:
+            print(f"Cross-encoder {model_name!r} unavailable ({e}); using the lexical reranker")
+    elif model_name:
+        print("sentence-transformers is not installed; using the lexical reranker")
+    return LexicalReranker()
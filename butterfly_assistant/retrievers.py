@@ -0,0 +1,252 @@
+"""Interchangeable retrieval backends.
+
+Every backend implements ``query(vector, top_k, namespace, filter=None) ->
+list[Match]`` (best match first), so the chat code does not care where the
+chunks live. ``filter`` uses Pinecone's metadata filter syntax; the local
+backends understand equality filters such as ``{"kit": {"$eq": "..."}}``.
+
+* ``pinecone`` – the hosted index (one network round trip per query); with a
+  local snapshot present it asks for IDs only and reads texts from the snapshot
+* ``numpy``    – exact brute-force cosine over a local snapshot
+* ``ivf``      – approximate inverted-file search over the same snapshot
+
+Compare recall and latency of the local backends on a snapshot with::
+
+    python -m butterfly_assistant.retrievers bench index_snapshot
+"""
+
+import asyncio
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from .chunk_store import ChunkStore
+from .local_index import LocalVectorIndex, Match, snapshot_from_pinecone
+
+
+class Retriever:
+    name = "base"
+
+    def query(self, vector, top_k, namespace, filter=None):
+        raise NotImplementedError
+
+    async def aquery(self, vector, top_k, namespace, filter=None):
+        # Blocking backends run on a worker thread so the event loop stays free
+        return await asyncio.to_thread(self.query, vector, top_k, namespace, filter)
+
+    def is_healthy(self):
+        return True
+
+
+class PineconeRetriever(Retriever):
+    name = "pinecone"
+
+    def __init__(self, index, chunk_store=None, healthcheck_interval=60, max_fetched=10000):
+        self.index = index
+        self.chunk_store = chunk_store
+        self.healthcheck_interval = healthcheck_interval
+        self._last_healthy = time.monotonic()
+        # Metadata of chunks newer than the local store (e.g. after an incremental ingest), fetched once.
+        # Chunk IDs are content hashes, so an ID's text never changes and entries need no expiry.
+        self.max_fetched = max_fetched
+        self._fetched = OrderedDict()
+        self._fetched_lock = threading.Lock()
+
+    def is_healthy(self):
+        # Ping at most once per interval so cached-resource validation stays cheap on reruns
+        if time.monotonic() - self._last_healthy < self.healthcheck_interval:
+            return True
+        try:
+            self.index.describe_index_stats()
+        except Exception:
+            return False
+        self._last_healthy = time.monotonic()
+        return True
+
+    def query(self, vector, top_k, namespace, filter=None):
+        store = self.chunk_store if self.chunk_store is not None and self.chunk_store.namespace == namespace else None
+        if store is None:
+            results = self.index.query(
+                vector=vector, top_k=top_k, namespace=namespace, filter=filter, include_metadata=True
+            )
+            return [Match(id=m.id, score=m.score, metadata=dict(m.metadata or {})) for m in results.matches]
+
+        # IDs and scores only; texts come from the local chunk store, so the response stays small
+        results = self.index.query(
+            vector=vector, top_k=top_k, namespace=namespace, filter=filter, include_metadata=False
+        )
+        fetched = self._fetch_missing([m.id for m in results.matches if m.id not in store], namespace)
+        return [
+            Match(id=m.id, score=m.score, metadata=store.metadata_for(m.id) if m.id in store else fetched[m.id])
+            for m in results.matches
+            if m.id in store or m.id in fetched
+        ]
+
+    def _fetch_missing(self, ids, namespace):
+        """Metadata for chunk IDs not in the local store, from the cache or one ``fetch`` call."""
+        with self._fetched_lock:
+            found = {i: self._fetched[i] for i in ids if i in self._fetched}
+            for chunk_id in found:
+                self._fetched.move_to_end(chunk_id)
+        missing = [i for i in ids if i not in found]
+        if missing:
+            vectors = self.index.fetch(ids=missing, namespace=namespace).vectors
+            with self._fetched_lock:
+                for chunk_id, vector in vectors.items():
+                    found[chunk_id] = self._fetched[chunk_id] = dict(vector.metadata or {})
+                while len(self._fetched) > self.max_fetched:
+                    self._fetched.popitem(last=False)
+        return found
+
+
+class NumpyRetriever(Retriever):
+    """Exact search: one matrix-vector product over every chunk."""
+
+    name = "numpy"
+
+    def __init__(self, local_index):
+        self.local_index = local_index
+        self._filtered_rows = {}
+
+    def query(self, vector, top_k, namespace, filter=None):
+        if namespace != self.local_index.namespace:
+            return []
+        rows, scores = self.local_index.search(vector, top_k, self._rows_for(filter))
+        return self._matches(rows, scores)
+
+    async def aquery(self, vector, top_k, namespace, filter=None):
+        # An in-memory search takes microseconds; a thread hop would cost more than it saves
+        return self.query(vector, top_k, namespace, filter)
+
+    def _rows_for(self, filter):
+        """Row numbers matching an equality ``filter`` (None = all rows), cached per filter."""
+        if not filter:
+            return None
+        key = tuple(sorted((field, repr(condition)) for field, condition in filter.items()))
+        if key not in self._filtered_rows:
+            rows = np.arange(len(self.local_index))
+            for field, condition in filter.items():
+                if isinstance(condition, dict):
+                    if set(condition) != {"$eq"}:
+                        raise ValueError(f"Local retrievers only support $eq filters, got {condition!r}")
+                    condition = condition["$eq"]
+                rows = np.intersect1d(rows, self.local_index.store.rows_where(field, condition))
+            self._filtered_rows[key] = rows
+        return self._filtered_rows[key]
+
+    def _matches(self, rows, scores):
+        ids, store = self.local_index.ids, self.local_index.store
+        return [Match(id=ids[r], score=float(s), metadata=store.metadata(r)) for r, s in zip(rows, scores)]
+
+
+class IVFRetriever(NumpyRetriever):
+    """Approximate search: spherical k-means partitions, only ``nprobe`` of which are scanned per query."""
+
+    name = "ivf"
+
+    def __init__(self, local_index, nlist=None, nprobe=4, iterations=10, seed=0):
+        super().__init__(local_index)
+        vectors = np.asarray(local_index.vectors, dtype=np.float32)
+        n = len(vectors)
+        self.nlist = max(1, min(n, nlist or int(np.sqrt(n))))
+        self.nprobe = min(nprobe, self.nlist)
+
+        rng = np.random.default_rng(seed)
+        centroids = vectors[rng.choice(n, self.nlist, replace=False)] if n else np.empty((0, vectors.shape[1]))
+        assignment = np.zeros(n, dtype=np.int64)
+        for _ in range(iterations):
+            assignment = np.argmax(vectors @ centroids.T, axis=1)
+            for c in range(self.nlist):
+                members = vectors[assignment == c]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    centroids[c] = centroid / (np.linalg.norm(centroid) or 1.0)
+
+        self.centroids = centroids
+        self.lists = [np.flatnonzero(assignment == c) for c in range(self.nlist)]
+        self.list_vectors = [vectors[rows] for rows in self.lists]
+
+    def query(self, vector, top_k, namespace, filter=None):
+        if filter:
+            # A filtered subset (one kit) is small enough to scan exactly
+            return super().query(vector, top_k, namespace, filter)
+        if namespace != self.local_index.namespace or not self.lists:
+            return []
+        query = np.asarray(vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+
+        probe = np.argsort(-(self.centroids @ query))[:self.nprobe]
+        rows = np.concatenate([self.lists[c] for c in probe])
+        scores = np.concatenate([self.list_vectors[c] @ query for c in probe])
+
+        if not len(rows):
+            return []
+        top_k = min(top_k, len(rows))
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+        return self._matches(rows[best], scores[best])
+
+
+def make_retriever(backend, snapshot_dir, namespace, pinecone_index):
+    """Build the configured backend.
+
+    ``pinecone_index`` is a zero-argument callable so Pinecone is only contacted
+    when it is the backend, or to sync/fall back for a missing local snapshot.
+    """
+    if backend == "pinecone":
+        # A local snapshot, when present, doubles as the chunk store for Pinecone results
+        chunk_store = ChunkStore(snapshot_dir) if ChunkStore.exists(snapshot_dir) else None
+        return PineconeRetriever(pinecone_index(), chunk_store)
+    if backend not in ("numpy", "local", "ivf"):
+        raise ValueError(f"Unknown retriever backend: {backend!r}")
+
+    try:
+        if not LocalVectorIndex.exists(snapshot_dir):
+            snapshot_from_pinecone(pinecone_index(), namespace, snapshot_dir)
+        local_index = LocalVectorIndex(snapshot_dir)
+    except Exception as e:
+        print(f"Local index unavailable ({e}); falling back to Pinecone")
+        return PineconeRetriever(pinecone_index())
+
+    return IVFRetriever(local_index) if backend == "ivf" else NumpyRetriever(local_index)
+
+
+def benchmark(retrievers, queries, namespace, top_k=5):
+    """Recall@k (against the first, exact retriever) and latency per backend."""
+    exact = [{m.id for m in retrievers[0].query(q, top_k, namespace)} for q in queries]
+    report = {}
+    for retriever in retrievers:
+        latencies, recalls = [], []
+        for q, truth in zip(queries, exact):
+            start = time.perf_counter()
+            found = {m.id for m in retriever.query(q, top_k, namespace)}
+            latencies.append(time.perf_counter() - start)
+            recalls.append(len(found & truth) / len(truth) if truth else 1.0)
+        report[retriever.name] = {
+            "recall_at_k": float(np.mean(recalls)),
+            "p50_ms": float(np.percentile(latencies, 50) * 1000),
+            "p95_ms": float(np.percentile(latencies, 95) * 1000),
+        }
+    return report
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != "bench":
+        sys.exit("usage: python -m butterfly_assistant.retrievers bench <snapshot-dir>")
+
+    local_index = LocalVectorIndex(sys.argv[2])
+    # Perturbed copies of stored chunks stand in for real question embeddings
+    rng = np.random.default_rng(0)
+    sample = rng.choice(len(local_index), min(200, len(local_index)), replace=False)
+    queries = np.asarray(local_index.vectors[sample]) + rng.normal(0, 0.02, (len(sample), local_index.vectors.shape[1]))
+
+    retrievers = [NumpyRetriever(local_index)] + [
+        IVFRetriever(local_index, nprobe=nprobe) for nprobe in (1, 2, 4, 8)
+    ]
+    for retriever in retrievers[1:]:
+        retriever.name = f"ivf(nlist={retriever.nlist}, nprobe={retriever.nprobe})"
+    for name, row in benchmark(retrievers, queries, local_index.namespace).items():
+        print(f"{name:<28} recall@5={row['recall_at_k']:.3f}  p50={row['p50_ms']:.3f}ms  p95={row['p95_ms']:.3f}ms")
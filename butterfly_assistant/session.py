@@ -0,0 +1,64 @@
+# ==============================
+# 📌 Per-session context
+# ==============================
+from collections import OrderedDict
+
+from .embedding_cache import normalize_query
+from .kits import detect_kit
+
+
+class SessionContext:
+    """What one chat has already established, kept in ``st.session_state``.
+
+    Once a kit is known (picked in the UI or named in a question) every later
+    question reuses it, so history is not re-scanned for kit names. A question
+    that names a different kit, a change of the kit picker, or "🔄 Reset Chat"
+    invalidates the kit together with the chunks retrieved for it.
+    """
+
+    def __init__(self, max_embeddings=32):
+        self.kit = None
+        self.kit_source = None  # "picker" or "question"
+        self.last_chunk_ids = []
+        self.max_embeddings = max_embeddings
+        self._embeddings = OrderedDict()
+
+    def resolve_kit(self, user_query, selected_kit=None):
+        """Kit scope for this question, updating the sticky kit when the user switches."""
+        if selected_kit:
+            self._switch(selected_kit, "picker")
+        elif self.kit_source == "picker":
+            self._switch(None, None)  # picker set back to auto-detect
+
+        named = detect_kit(user_query)
+        if named and named != self.kit and self.kit_source != "picker":
+            self._switch(named, "question")
+        return self.kit
+
+    def embedding(self, text):
+        key = normalize_query(text)
+        if key in self._embeddings:
+            self._embeddings.move_to_end(key)
+            return self._embeddings[key]
+        return None
+
+    def remember(self, text, embedding, chunk_ids):
+        if embedding is not None:  # None when a lexical hit made embedding unnecessary
+            self._embeddings[normalize_query(text)] = embedding
+            while len(self._embeddings) > self.max_embeddings:
+                self._embeddings.popitem(last=False)
+        self.last_chunk_ids = list(chunk_ids)
+
+    def state(self):
+        """The part that travels with API requests; query embeddings stay on the serving side."""
+        return {"kit": self.kit, "kit_source": self.kit_source, "last_chunk_ids": list(self.last_chunk_ids)}
+
+    def restore(self, state):
+        self.kit = state.get("kit")
+        self.kit_source = state.get("kit_source")
+        self.last_chunk_ids = list(state.get("last_chunk_ids") or [])
+
+    def _switch(self, kit, source):
+        if kit != self.kit:
+            self.last_chunk_ids = []  # retrieved for the old kit; embeddings don't depend on it
+        self.kit, self.kit_source = kit, source
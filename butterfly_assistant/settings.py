@@ -0,0 +1,88 @@
+# ==============================
+# ⚙️ Settings
+# ==============================
+# Everything here can be overridden with an environment variable of the same name.
+# In the Streamlit app, root-level keys in .streamlit/secrets.toml are exported as
+# environment variables too, so they can live there alongside the API keys.
+import os
+
+OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY", "")
+PINECONE_API_KEY = os.environ.get("PINECONE_API_KEY", "")
+
+# 📦 Pinecone
+PINECONE_INDEX_NAME = os.environ.get("PINECONE_INDEX_NAME", "diy-kit-support")
+PINECONE_NAMESPACE = os.environ.get("PINECONE_NAMESPACE", "diy_kit_support_chunks")
+
+# 🤖 OpenAI models
+OPENAI_EMBED_MODEL = os.environ.get("OPENAI_EMBED_MODEL", "text-embedding-3-small")
+OPENAI_CHAT_MODEL = os.environ.get("OPENAI_CHAT_MODEL", "gpt-3.5-turbo")  # 💰 cheaper model for main chat
+
+# 🔎 Retrieval backend: "pinecone" (hosted), "numpy" (exact, local snapshot) or "ivf"
+# (approximate, local snapshot). Local backends sync the snapshot from Pinecone on first
+# use and fall back to Pinecone if that fails. "local" is accepted as an alias for "numpy".
+RETRIEVER_BACKEND = os.environ.get("RETRIEVER_BACKEND", "pinecone")
+LOCAL_INDEX_DIR = os.environ.get("LOCAL_INDEX_DIR", "index_snapshot")
+
+# 🔤 Hybrid retrieval: BM25 over the local snapshot's chunk texts, fused with the vector
+# results (needs a snapshot in LOCAL_INDEX_DIR). With LEXICAL_SKIP_EMBEDDING, a confident
+# exact-term hit (e.g. a part name) is answered without calling the embeddings API.
+HYBRID_RETRIEVAL = os.environ.get("HYBRID_RETRIEVAL", "true").lower() == "true"
+LEXICAL_SKIP_EMBEDDING = os.environ.get("LEXICAL_SKIP_EMBEDDING", "true").lower() == "true"
+
+# 🎯 Reranking: retrieve RERANK_CANDIDATES chunks, re-score them locally and pass only the
+# best RERANK_KEEP to the LLM. RERANK_MODEL optionally names a sentence-transformers
+# cross-encoder; otherwise a lexical-overlap scorer is used.
+RERANK_ENABLED = os.environ.get("RERANK_ENABLED", "true").lower() == "true"
+RERANK_CANDIDATES = int(os.environ.get("RERANK_CANDIDATES", "12"))
+RERANK_KEEP = int(os.environ.get("RERANK_KEEP", "3"))
+RERANK_MODEL = os.environ.get("RERANK_MODEL", "")
+
+# 🗜️ Context compression: drop duplicate chunks, repeated boilerplate and sentences
+# unrelated to the question before the context goes into the prompt
+CONTEXT_COMPRESSION = os.environ.get("CONTEXT_COMPRESSION", "true").lower() == "true"
+
+# ⚡ Below the confidence threshold, return the canned fallback (kit list) right away
+# instead of asking the LLM to paraphrase it
+FALLBACK_FAST_PATH = os.environ.get("FALLBACK_FAST_PATH", "true").lower() == "true"
+
+# 🎛️ Tuning (see tuning.py): QUERY_LOG_PATH, when set, logs every query's scores for
+# labelling; per-kit thresholds and chunk counts computed from it are read from TUNING_PATH
+QUERY_LOG_PATH = os.environ.get("QUERY_LOG_PATH", "")  # e.g. "query_log.jsonl"
+TUNING_PATH = os.environ.get("TUNING_PATH", "tuning.json")
+
+# ⏱️ Tracing: per-stage timing spans, written as JSON lines to TRACE_LOG_PATH and/or sent
+# over OTLP/HTTP to an OpenTelemetry collector (e.g. "http://localhost:4318")
+TRACE_LOG_PATH = os.environ.get("TRACE_LOG_PATH", "")
+OTEL_EXPORTER_OTLP_ENDPOINT = os.environ.get("OTEL_EXPORTER_OTLP_ENDPOINT", "")
+
+# 📈 Prometheus metrics (see metrics.py): served at http://<host>:METRICS_PORT/metrics
+# (0 = off) and/or written to METRICS_TEXTFILE_PATH for node_exporter's textfile collector.
+# Under api.py each worker takes the next free port from METRICS_PORT instead, and
+# METRICS_TEXTFILE_PATH is ignored: per-worker files would repeat the same series.
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))
+METRICS_TEXTFILE_PATH = os.environ.get("METRICS_TEXTFILE_PATH", "")
+
+# 🛰️ API service (see api.py): when set, the Streamlit app is a thin client that sends
+# questions to this URL (e.g. "http://assistant-api:8000") instead of running the pipeline
+ASSISTANT_API_URL = os.environ.get("ASSISTANT_API_URL", "")
+
+# 🗃️ Embedding cache
+EMBED_CACHE_SIZE = int(os.environ.get("EMBED_CACHE_SIZE", "2048"))
+EMBED_CACHE_PATH = os.environ.get("EMBED_CACHE_PATH", "")  # e.g. "embeddings.sqlite3", shared across workers
+
+# 💬 Semantic answer cache
+ANSWER_CACHE_MAX_DISTANCE = float(os.environ.get("ANSWER_CACHE_MAX_DISTANCE", "0.05"))  # cosine distance
+ANSWER_CACHE_TTL_SECONDS = int(os.environ.get("ANSWER_CACHE_TTL_SECONDS", str(24 * 3600)))
+ANSWER_CACHE_MAX_ENTRIES = int(os.environ.get("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+
+# 🧠 Chat history: most recent turns are kept while they fit this many prompt tokens
+HISTORY_TOKEN_BUDGET = int(os.environ.get("HISTORY_TOKEN_BUDGET", "1500"))
+
+# 📝 Rolling summary: once SUMMARY_BATCH_TURNS turns have aged out of the newest
+# SUMMARY_KEEP_RECENT_TURNS, they are folded into a running summary in the background
+SUMMARY_ENABLED = os.environ.get("SUMMARY_ENABLED", "true").lower() == "true"
+SUMMARY_KEEP_RECENT_TURNS = int(os.environ.get("SUMMARY_KEEP_RECENT_TURNS", "4"))
+SUMMARY_BATCH_TURNS = int(os.environ.get("SUMMARY_BATCH_TURNS", "4"))
+
+# 🌐 UI: stream tokens into the chat bubble instead of waiting for the full completion
+STREAM_ANSWERS = os.environ.get("STREAM_ANSWERS", "true").lower() == "true"
@@ -0,0 +1,179 @@
+"""Per-request timing spans for the answer pipeline.
+
+A :class:`Trace` is one user question. Its root span covers the whole request
+and each stage (``embed``, ``retrieve``, ``prompt-build``, ``generate``,
+``render``) is a child span. Finished traces go to the configured exporters:
+
+* ``TRACE_LOG_PATH`` – one JSON line per trace
+* ``OTEL_EXPORTER_OTLP_ENDPOINT`` – OpenTelemetry spans over OTLP/HTTP JSON, e.g.
+  ``http://localhost:4318`` for a local collector or Jaeger
+
+Both exporters write from a background thread, so a slow disk or a missing
+collector never delays an answer.
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+
+SERVICE_NAME = "butterfly-assistant"
+
+
+class Span:
+    def __init__(self, name, trace_id, parent_id=None, **attributes):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self._started = time.perf_counter()
+        self.duration_ms = None
+
+    def end(self, **attributes):
+        if self.duration_ms is None:  # a span ends once; later calls only add attributes
+            self.duration_ms = (time.perf_counter() - self._started) * 1000
+        self.attributes.update(attributes)
+
+    @property
+    def end_ns(self):
+        return self.start_ns + int((self.duration_ms or 0) * 1e6)
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "duration_ms": round(self.duration_ms, 3) if self.duration_ms is not None else None,
+            "attributes": self.attributes,
+        }
+
+
+class Trace:
+    """Spans of one request, all children of the root span (stages may overlap on the async path)."""
+
+    def __init__(self, name="answer", **attributes):
+        self.trace_id = os.urandom(16).hex()
+        self.root = Span(name, self.trace_id, **attributes)
+        self.spans = [self.root]
+
+    def start(self, name, **attributes):
+        span = Span(name, self.trace_id, self.root.span_id, **attributes)
+        self.spans.append(span)
+        return span
+
+    @contextmanager
+    def span(self, name, **attributes):
+        span = self.start(name, **attributes)
+        try:
+            yield span
+        finally:
+            span.end()
+
+    def durations(self):
+        """Finished spans as ``{name: ms}``, root included."""
+        return {s.name: s.duration_ms for s in self.spans if s.duration_ms is not None}
+
+    def finish(self, exporters=(), **attributes):
+        self.root.end(**attributes)
+        for exporter in exporters:
+            exporter.export(self)
+
+    def to_dict(self):
+        return {"trace_id": self.trace_id, "spans": [s.to_dict() for s in self.spans]}
+
+
+# ==============================
+# 📤 Exporters
+# ==============================
+class JsonLogExporter:
+    """Appends each trace to ``path`` from a single writer thread, so lines stay whole and in order."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lines = queue.Queue()
+        threading.Thread(target=self._write, daemon=True).start()
+
+    def export(self, trace):
+        self._lines.put(json.dumps(trace.to_dict(), ensure_ascii=False, default=str) + "\n")
+
+    def _write(self):
+        while True:
+            lines = [self._lines.get()]
+            while not self._lines.empty():  # batch whatever queued up during the last write
+                lines.append(self._lines.get_nowait())
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.writelines(lines)
+            except OSError as e:
+                print(f"Trace log write to {self.path} failed: {e}")
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OtlpHttpExporter:
+    """POSTs each trace to an OpenTelemetry collector's ``/v1/traces`` (OTLP/HTTP, JSON encoding)."""
+
+    def __init__(self, endpoint, service_name=SERVICE_NAME, timeout=2.0):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.service_name = service_name
+        self.timeout = timeout
+        self._warned = False
+
+    def payload(self, trace):
+        spans = [
+            {
+                "traceId": s.trace_id,
+                "spanId": s.span_id,
+                **({"parentSpanId": s.parent_id} if s.parent_id else {}),
+                "name": s.name,
+                "kind": 1,  # SPAN_KIND_INTERNAL
+                "startTimeUnixNano": str(s.start_ns),
+                "endTimeUnixNano": str(s.end_ns),
+                "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()],
+            }
+            for s in trace.spans
+            if s.duration_ms is not None
+        ]
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+                "scopeSpans": [{"scope": {"name": self.service_name}, "spans": spans}],
+            }]
+        }
+
+    def export(self, trace):
+        threading.Thread(target=self._post, args=(self.payload(trace),), daemon=True).start()
+
+    def _post(self, payload):
+        request = urllib.request.Request(
+            self.url, data=json.dumps(payload).encode("utf-8"), headers={"Content-Type": "application/json"}
+        )
+        try:
+            urllib.request.urlopen(request, timeout=self.timeout).close()
+        except Exception as e:
+            if not self._warned:  # once: a missing collector shouldn't flood the log
+                self._warned = True
+                print(f"Trace export to {self.url} failed: {e}")
+
+
+def make_exporters(log_path="", otlp_endpoint=""):
+    exporters = []
+    if log_path:
+        exporters.append(JsonLogExporter(log_path))
+    if otlp_endpoint:
+        exporters.append(OtlpHttpExporter(otlp_endpoint))
+    return exporters
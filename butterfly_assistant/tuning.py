@@ -0,0 +1,200 @@
+"""Per-kit confidence threshold and chunk count, tuned offline from logged queries.
+
+1. **Log** – with ``QUERY_LOG_PATH`` set, the pipeline appends one JSON line per
+   query: its kit, retrieval mode, best score, the scores of every candidate, the
+   threshold used and the IDs of the chunks sent to the LLM.
+2. **Label** – 👍/👎 under an answer in the app, or from the command line::
+
+       python -m butterfly_assistant.tuning label query_log.jsonl <query_id> --answerable yes --useful-chunks id1,id2
+
+   ``answerable`` says whether the manuals cover the question (so the right
+   behaviour was to answer rather than fall back); ``useful-chunks`` are the
+   chunks the answer actually needed.
+3. **Tune** – ``python -m butterfly_assistant.tuning tune query_log.jsonl -o tuning.json`` picks, per
+   kit with enough labels (and overall), the threshold that best separates
+   answerable from unanswerable questions and the smallest number of chunks that
+   still covers the useful ones. The pipeline applies ``TUNING_PATH`` at start-up.
+
+Chunk counts can only be tuned down: a label can mark only chunks that were sent.
+Delete ``tuning.json`` to go back to the defaults and re-collect.
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+import uuid
+
+import numpy as np
+
+DEFAULT_KEY = "*"  # questions not scoped to a kit, and kits without enough labels
+
+
+# ==============================
+# 📝 Query log
+# ==============================
+class QueryLog:
+    """Append-only JSONL of query records and, referring to them by ``query_id``, their labels."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def log_query(self, **record):
+        query_id = uuid.uuid4().hex
+        self._append({"type": "query", "query_id": query_id, "time": time.time(), **record})
+        return query_id
+
+    def label(self, query_id, answerable=None, useful_chunks=None, helpful=None):
+        self._append({
+            "type": "label",
+            "query_id": query_id,
+            "time": time.time(),
+            "answerable": answerable,
+            "useful_chunks": useful_chunks,
+            "helpful": helpful,
+        })
+
+    def _append(self, record):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+def feedback_label(helpful, answered):
+    """Turn 👍/👎 on an answer (or on the fallback) into an ``answerable`` label.
+
+    👍 on an answer or 👎 on the fallback means the manuals cover the question;
+    👍 on the fallback means they don't. 👎 on an answer is ambiguous (wrong chunks
+    or an out-of-scope question), so it says nothing about answerability.
+    """
+    if answered:
+        return True if helpful else None
+    return not helpful
+
+
+def labelled_queries(path):
+    """Query records merged with their labels (later labels win per field); unlabelled queries are skipped."""
+    queries, labels = {}, {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record["type"] == "query":
+                queries[record["query_id"]] = record
+            else:
+                label = {k: v for k, v in record.items() if v is not None and k not in ("type", "time")}
+                labels.setdefault(record["query_id"], {}).update(label)
+    return [{**queries[query_id], **label} for query_id, label in labels.items() if query_id in queries]
+
+
+# ==============================
+# 🎛️ Tuning
+# ==============================
+def best_threshold(samples, default):
+    """Threshold with the fewest wrong answer/fallback decisions on ``(best_score, answerable)`` samples.
+
+    Candidates are midpoints between neighbouring scores; ties go to the one nearest ``default``.
+    """
+    scores = sorted({score for score, _ in samples})
+    candidates = [default] + [(a + b) / 2 for a, b in zip(scores, scores[1:])]
+    candidates += [scores[0] - 1e-6, scores[-1] + 1e-6] if scores else []
+
+    def errors(threshold):
+        return sum((score >= threshold) != answerable for score, answerable in samples)
+
+    return min(candidates, key=lambda t: (errors(t), abs(t - default)))
+
+
+def best_top_k(rank_lists, default, coverage=0.9):
+    """Chunks needed to include every useful chunk in ``coverage`` of the labelled answers."""
+    needed = [max(ranks) for ranks in rank_lists if ranks]
+    if not needed:
+        return default
+    return int(min(default, max(1, np.ceil(np.percentile(needed, coverage * 100)))))
+
+
+def tune(records, default_threshold=0.5, default_top_k=3, min_samples=20):
+    groups = {DEFAULT_KEY: records}
+    for record in records:
+        if record.get("kit"):
+            groups.setdefault(record["kit"], []).append(record)
+
+    settings = {}
+    for key, group in groups.items():
+        # Lexical-only answers report term coverage, not a cosine score
+        scored = [(r["best_score"], r["answerable"]) for r in group
+                  if "answerable" in r and r.get("retrieval") != "lexical"]
+        ranks = [
+            [r["chunk_ids"].index(c) + 1 for c in r["useful_chunks"] if c in r["chunk_ids"]]
+            for r in group
+            if r.get("useful_chunks")
+        ]
+        entry = {"samples": len(group)}
+        if len(scored) >= min_samples:
+            entry["threshold"] = round(best_threshold(scored, default_threshold), 4)
+        if len(ranks) >= min_samples:
+            entry["top_k"] = best_top_k(ranks, default_top_k)
+        if len(entry) > 1:
+            settings[key] = entry
+    return settings
+
+
+class Tuning:
+    """Tuned settings per kit, falling back to the overall entry and then to the caller's default."""
+
+    def __init__(self, settings=None):
+        self.settings = settings or {}
+
+    @classmethod
+    def load(cls, path):
+        if not path or not os.path.exists(path):
+            return cls()
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def _get(self, kit, name, default):
+        for key in (kit, DEFAULT_KEY):
+            if key and name in self.settings.get(key, {}):
+                return self.settings[key][name]
+        return default
+
+    def threshold(self, kit, default):
+        return self._get(kit, "threshold", default)
+
+    def top_k(self, kit, default):
+        return self._get(kit, "top_k", default)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    label = commands.add_parser("label", help="label one logged query")
+    label.add_argument("log")
+    label.add_argument("query_id")
+    label.add_argument("--answerable", choices=["yes", "no"])
+    label.add_argument("--useful-chunks", help="comma-separated chunk IDs the answer needed")
+
+    tune_cmd = commands.add_parser("tune", help="compute per-kit settings from the labelled log")
+    tune_cmd.add_argument("log")
+    tune_cmd.add_argument("-o", "--output", default="tuning.json")
+    tune_cmd.add_argument("--threshold", type=float, default=0.5, help="default confidence threshold")
+    tune_cmd.add_argument("--top-k", type=int, default=3, help="default chunks sent to the LLM")
+    tune_cmd.add_argument("--min-samples", type=int, default=20, help="labels needed per kit")
+    args = parser.parse_args()
+
+    if args.command == "label":
+        QueryLog(args.log).label(
+            args.query_id,
+            answerable=None if args.answerable is None else args.answerable == "yes",
+            useful_chunks=args.useful_chunks.split(",") if args.useful_chunks else None,
+        )
+    else:
+        settings = tune(labelled_queries(args.log), args.threshold, args.top_k, args.min_samples)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(settings, f, indent=1, sort_keys=True)
+        for key, entry in sorted(settings.items()):
+            print(f"{'overall' if key == DEFAULT_KEY else key}: {entry}")